@@ -0,0 +1,451 @@
+from operator import sub, mul
+from itertools import repeat
+from vector import Vector, numpy, imap
+from hyperplane import hyperplane_type
+from solution import Solution
+
+#decimal, fractions (which imports decimal and re) and blocked are imported
+#by the decimal, fraction and panel code paths that use them, so that the
+#float solver does not pay for them at import
+
+
+def to_decimal(x):
+    from decimal import Decimal
+    from fractions import Fraction
+    if isinstance(x, Decimal):
+        return x
+    if isinstance(x, Fraction):
+        return Decimal(x.numerator) / Decimal(x.denominator)
+    if isinstance(x, float):
+        #repr gives the shortest decimal that round-trips, e.g. 4.046
+        return Decimal(repr(x))
+    return Decimal(x)
+
+
+def to_fraction(x):
+    from fractions import Fraction
+    if isinstance(x, float):
+        return Fraction(repr(x))
+    return Fraction(x)
+
+
+class AugmentedMatrix(object):
+
+    ALL_ROWS_MUST_HAVE_SAME_LENGTH_MSG = 'All rows of the augmented matrix should have the same length'
+    NO_ROWS_MSG = 'The augmented matrix needs at least one row'
+    UNKNOWN_NUMERIC_MODE_MSG = 'Unknown numeric mode'
+
+    #float: float64 (numpy when available); decimal: Decimal at a fixed
+    #precision, held in this matrix's own decimal.Context so the global one
+    #is never touched; fraction: exact rationals with fraction-free elimination
+    NUMERIC_MODES = ('float', 'decimal', 'fraction')
+    CONVERTERS = {'float': float, 'decimal': to_decimal, 'fraction': to_fraction}
+
+    zero_tolerance = 1e-10
+    #Systems with more variables than this are eliminated panel by panel;
+    #None for blocked.block_size
+    block_size = None
+    #'partial': the largest magnitude entry of the column is the pivot;
+    #'first': the first nonzero one, which gives the triangular form of the
+    #plane by plane elimination (fraction mode always pivots this way)
+    pivoting = 'partial'
+
+    #Dense [A | b] matrix for a linear system. Row operations and elimination
+    #work in place on this one buffer (a float64 numpy matrix, or a list of
+    #rows) and rows are swapped by index; Plane objects are only built again by
+    #to_planes(). An optional tracing.Tracer sees every elimination step.
+    #
+    #With copy=False a float64 numpy matrix is used as the buffer directly;
+    #a numpy.memmap (see ingest) is then eliminated out of core, a panel at a
+    #time, without tracing.
+    def __init__(self, rows, numeric='float', precision=30, tracer=None, copy=True):
+        if numeric not in self.NUMERIC_MODES:
+            raise ValueError(self.UNKNOWN_NUMERIC_MODE_MSG)
+        self.numeric = numeric
+        self.precision = precision
+        self.context = None
+        if numeric == 'decimal':
+            from decimal import Context
+            self.context = Context(prec=precision)
+        self.tracer = tracer
+        self.use_numpy = numpy is not None and numeric == 'float'
+        self.out_of_core = self.use_numpy and not copy and isinstance(rows, numpy.memmap)
+
+        if self.use_numpy:
+            rows = (numpy.array if copy else numpy.asarray)(rows, dtype=numpy.float64)
+            if rows.ndim != 2 or rows.shape[0] == 0:
+                raise ValueError(self.NO_ROWS_MSG)
+        else:
+            convert = self.CONVERTERS[numeric]
+            if numeric == 'decimal':
+                with self.arithmetic():
+                    rows = [[convert(x) for x in r] for r in rows]
+            else:
+                rows = [[convert(x) for x in r] for r in rows]
+            if not rows:
+                raise ValueError(self.NO_ROWS_MSG)
+            for r in rows:
+                if len(r) != len(rows[0]):
+                    raise ValueError(self.ALL_ROWS_MUST_HAVE_SAME_LENGTH_MSG)
+        self.rows = rows
+        self.dimension = len(rows[0]) - 1
+        self.pivot_columns = None
+        self.reduced = False
+
+        #Exact rationals need no tolerance: only a true zero is zero
+        if numeric == 'fraction':
+            self.zero_tolerance = 0
+        self.zero = self.CONVERTERS[numeric](0)
+        self.one = self.CONVERTERS[numeric](1)
+
+    @classmethod
+    def from_planes(cls, planes, numeric='float', precision=30, tracer=None):
+        return cls([list(p.normal_vector.coordinates) + [p.constant_term] for p in planes],
+                   numeric, precision, tracer)
+
+    def to_planes(self):
+        #Lines, Planes or Hyperplanes, whichever fits the dimension
+        row_type = hyperplane_type(self.dimension)
+        if self.use_numpy:
+            return [row_type(Vector(r[:-1]), float(r[-1])) for r in self.rows]
+        return [row_type(Vector(r[:-1]), r[-1]) for r in self.rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        return self.rows[i]
+
+    def __str__(self):
+        ret = 'Augmented Matrix:\n'
+        temp = ['Row {}: {}'.format(i+1, ' '.join('{:.3f}'.format(float(x)) for x in r))
+                for i, r in enumerate(self.rows)]
+        ret += '\n'.join(temp)
+        return ret
+
+    def is_zero(self, x):
+        if self.numeric == 'fraction':
+            return x == 0
+        return abs(x) < self.zero_tolerance
+
+    def swap_rows(self, row1, row2):
+        if row1 == row2:
+            return
+        if self.tracer is not None:
+            self.tracer.rows_swapped(row1, row2)
+        if self.use_numpy:
+            self.rows[[row1, row2]] = self.rows[[row2, row1]]
+        else:
+            self.rows[row1], self.rows[row2] = self.rows[row2], self.rows[row1]
+
+    def multiply_coefficient_and_row(self, coefficient, row):
+        if self.tracer is not None:
+            self.tracer.row_scaled(coefficient, row)
+        if self.use_numpy:
+            self.rows[row] *= coefficient
+        else:
+            r = self.rows[row]
+            r[:] = imap(mul, r, repeat(coefficient))
+
+    def add_multiple_times_row_to_row(self, coefficient, row_to_add, row_to_be_added_to, start=0):
+        #start skips the leading columns already known to be zero in both rows
+        if self.tracer is not None:
+            self.tracer.row_added(coefficient, row_to_add, row_to_be_added_to)
+        if self.use_numpy:
+            self.rows[row_to_be_added_to, start:] += coefficient * self.rows[row_to_add, start:]
+        else:
+            src = self.rows[row_to_add]
+            dst = self.rows[row_to_be_added_to]
+            dst[start:] = [x + coefficient*y for x, y in zip(dst[start:], src[start:])]
+
+    def find_pivot_row(self, col, first_row):
+        #Partial pivoting: the row with the largest magnitude entry in col
+        if self.pivoting == 'first':
+            for p in range(first_row, len(self.rows)):
+                if not self.is_zero(self.rows[p][col]):
+                    return p
+            return None
+        if self.use_numpy:
+            p = first_row + int(numpy.argmax(numpy.abs(self.rows[first_row:, col])))
+        else:
+            p = max(range(first_row, len(self.rows)), key=lambda r: abs(self.rows[r][col]))
+        if self.is_zero(self.rows[p][col]):
+            return None
+        return p
+
+    def arithmetic(self):
+        #Context manager that computes in this matrix's own decimal context
+        from decimal import localcontext
+        return localcontext(self.context)
+
+    def panel_size(self, block_size):
+        if block_size or self.block_size:
+            return block_size or self.block_size
+        import blocked
+        return blocked.block_size
+
+    def use_blocked(self, block_size):
+        #Panels do not have per-row steps to report, so tracing stays
+        #unblocked; they always pivot partially
+        return (self.use_numpy and self.tracer is None and self.pivoting == 'partial' and
+                self.dimension > self.panel_size(block_size))
+
+    def compute_triangular_form(self, block_size=None):
+        if self.numeric == 'fraction':
+            return self.compute_bareiss_form()
+        if self.numeric == 'decimal':
+            with self.arithmetic():
+                return self.eliminate_below(block_size)
+        return self.eliminate_below(block_size)
+
+    def eliminate_below(self, block_size):
+        A = self.rows
+        if self.out_of_core:
+            import blocked
+            self.pivot_columns = blocked.eliminate_out_of_core(A, self.dimension, self.panel_size(block_size),
+                                                               self.zero_tolerance)[0]
+            self.reduced = False
+            return self
+        if self.use_blocked(block_size):
+            import blocked
+            self.pivot_columns = blocked.eliminate(A, self.dimension, self.panel_size(block_size),
+                                                   self.zero_tolerance)[0]
+            self.reduced = False
+            return self
+
+        pivots = []
+        row = 0
+        for col in range(self.dimension):
+            if row >= len(A):
+                break
+            p = self.find_pivot_row(col, row)
+            if p is None:
+                continue
+            self.swap_rows(row, p)
+            if self.tracer is not None:
+                self.tracer.pivot_chosen(row, col, A[row][col])
+
+            if self.use_numpy:
+                alphas = A[row+1:, col] / A[row, col]
+                if self.tracer is not None:
+                    for r, alpha in enumerate(alphas, row+1):
+                        if alpha:
+                            self.tracer.row_added(-alpha, row, r)
+                A[row+1:, col:] -= numpy.outer(alphas, A[row, col:])
+                A[row+1:, col] = 0.0
+            else:
+                pivot = A[row]
+                leadingCoefficient = pivot[col]
+                for r in range(row+1, len(A)):
+                    alpha = A[r][col] / leadingCoefficient
+                    if alpha:
+                        if self.tracer is not None:
+                            self.tracer.row_added(-alpha, row, r)
+                        target = A[r]
+                        target[col:] = imap(sub, target[col:], imap(mul, repeat(alpha), pivot[col:]))
+                        target[col] = self.zero
+
+            pivots.append(col)
+            row += 1
+
+        self.pivot_columns = pivots
+        self.reduced = False
+        return self
+
+    def compute_bareiss_form(self):
+        #Fraction-free (Bareiss) elimination. Rows are first scaled to
+        #integers; afterwards every entry is a minor of that integer matrix,
+        #divided exactly by the previous pivot, so numbers stay as small as
+        #the determinants involved instead of growing with every step.
+        from fractions import Fraction
+        try:
+            from math import gcd
+        except ImportError:
+            from fractions import gcd
+        A = self.rows
+        for i, r in enumerate(A):
+            scale = 1
+            for x in r:
+                scale = scale * x.denominator // gcd(scale, x.denominator)
+            if self.tracer is not None and scale != 1:
+                self.tracer.row_scaled(scale, i)
+            r[:] = [int(x * scale) for x in r]
+
+        pivots = []
+        previous = 1
+        row = 0
+        for col in range(self.dimension):
+            if row >= len(A):
+                break
+            p = row
+            while p < len(A) and A[p][col] == 0:
+                p += 1
+            if p == len(A):
+                continue
+            self.swap_rows(row, p)
+
+            pivot = A[row]
+            leadingCoefficient = pivot[col]
+            if self.tracer is not None:
+                self.tracer.pivot_chosen(row, col, leadingCoefficient)
+            for r in range(row+1, len(A)):
+                target = A[r]
+                alpha = target[col]
+                if self.tracer is not None:
+                    #new row = (lead * row - alpha * pivot row) / previous
+                    self.tracer.row_scaled(Fraction(leadingCoefficient, previous), r)
+                    self.tracer.row_added(Fraction(-alpha, previous), row, r)
+                for j in range(col+1, len(target)):
+                    target[j] = (leadingCoefficient * target[j] - alpha * pivot[j]) // previous
+                target[col] = 0
+            previous = leadingCoefficient
+            pivots.append(col)
+            row += 1
+
+        for r in A:
+            r[:] = [Fraction(x) for x in r]
+        self.pivot_columns = pivots
+        self.reduced = False
+        return self
+
+    def compute_rref(self, block_size=None):
+        if self.numeric == 'decimal':
+            with self.arithmetic():
+                return self.reduce(block_size)
+        return self.reduce(block_size)
+
+    def reduce(self, block_size):
+        self.compute_triangular_form(block_size)
+        A = self.rows
+        if self.out_of_core:
+            import blocked
+            blocked.back_substitute_out_of_core(A, self.pivot_columns, self.panel_size(block_size))
+            self.reduced = True
+            return self
+        if self.use_blocked(block_size):
+            import blocked
+            blocked.back_substitute(A, self.pivot_columns, self.panel_size(block_size))
+            self.reduced = True
+            return self
+
+        for row in range(len(self.pivot_columns)-1, -1, -1):
+            col = self.pivot_columns[row]
+            self.multiply_coefficient_and_row(self.one / A[row][col], row)
+            A[row][col] = self.one
+
+            if self.use_numpy:
+                if self.tracer is not None:
+                    for r in range(row):
+                        if A[r, col]:
+                            self.tracer.row_added(-A[r, col], row, r)
+                A[:row, col:] -= numpy.outer(A[:row, col], A[row, col:])
+                A[:row, col] = 0.0
+            else:
+                for r in range(row):
+                    alpha = A[r][col]
+                    if alpha:
+                        self.add_multiple_times_row_to_row(-alpha, row, r, start=col)
+                        A[r][col] = self.zero
+        self.reduced = True
+        return self
+
+    def solution(self):
+        #Read the solution set off the RREF: a nonzero right-hand side on a
+        #zero row means no solution, otherwise the pivot variables are given
+        #by the basepoint plus one direction per free variable. Decimal and
+        #fraction modes keep their exact values in the returned Vectors.
+        if not self.reduced:
+            self.compute_rref()
+        A = self.rows
+        n = self.dimension
+        rank = len(self.pivot_columns)
+        for row in range(rank, len(A)):
+            if not self.is_zero(A[row][n]):
+                return Solution.none(rank)
+
+        value = float if self.use_numpy else (lambda x: x)
+        basepoint = [self.zero] * n
+        for row, col in enumerate(self.pivot_columns):
+            basepoint[col] = value(A[row][n])
+        if rank == n:
+            return Solution(Solution.UNIQUE, Vector(basepoint), rank=rank)
+
+        pivots = set(self.pivot_columns)
+        directions = []
+        for free in range(n):
+            if free in pivots:
+                continue
+            direction = [self.zero] * n
+            direction[free] = self.one
+            for row, col in enumerate(self.pivot_columns):
+                direction[col] = -value(A[row][free])
+            directions.append(Vector(direction))
+        return Solution(Solution.INFINITE, Vector(basepoint), directions, rank)
+
+
+def eliminationTest():
+    print("******\nAUGMENTED MATRIX ELIMINATION")
+    import random
+    from linsys import LinearSystem
+    from plane import Plane
+    from tracing import Tracer
+
+    def nonzero(planes):
+        return [p for p in planes if p != Plane()]
+
+    #Same reduced rows as the plane by plane LinearSystem.compute_rref
+    cases = [[[1, 1, 1, 1], [0, 1, 1, 2]],
+             [[1, 1, 1, 1], [1, 1, 1, 2]],
+             [[1, 1, 1, 1], [0, 1, 0, 2], [1, 1, -1, 3], [1, 0, -2, 2]],
+             [[0, 1, 1, 1], [1, -1, 1, 2], [1, 2, -5, 3]]]
+    for i, rows in enumerate(cases):
+        planes = [Plane(Vector(r[:3]), r[3]) for r in rows]
+        expected = nonzero(LinearSystem(planes).compute_rref().planes)
+        if nonzero(AugmentedMatrix(rows).compute_rref().to_planes()) != expected:
+            print('test case {} failed'.format(i+1))
+
+    #Partial pivoting: eliminating with the 1e-20 pivot would lose x
+    solution = AugmentedMatrix([[1e-20, 1, 1], [1, 1, 2]]).solution()
+    if [round(x, 9) for x in solution.basepoint] != [1.0, 1.0]:
+        print('test case 5 failed')
+
+    #Panels and the column by column loop (forced by a tracer) agree
+    if numpy is not None:
+        rnd = random.Random(0)
+        rows = [[rnd.uniform(-1, 1) for j in range(21)] for i in range(20)]
+        blocked_rows = AugmentedMatrix(rows).compute_rref(block_size=4).rows
+        unblocked_rows = AugmentedMatrix(rows, tracer=Tracer()).compute_rref(block_size=4).rows
+        if abs(blocked_rows - unblocked_rows).max() > 1e-9:
+            print('test case 6 failed')
+
+
+def numericModesTest():
+    print("******\nNUMERIC MODES")
+    from decimal import Decimal
+    from fractions import Fraction
+    #5x5 Hilbert matrix, exactly solvable with x = (1, ..., 1)
+    n = 5
+    A = [[Fraction(1, i + j + 1) for j in range(n)] for i in range(n)]
+    rows = [r + [sum(r)] for r in A]
+
+    #Bareiss keeps integers during elimination and the exact answer after it
+    m = AugmentedMatrix(rows, 'fraction').compute_triangular_form()
+    if not all(x.denominator == 1 for r in m.rows for x in r):
+        print('test case 1 failed')
+    x = AugmentedMatrix(rows, 'fraction').solution().basepoint.coordinates
+    if list(x) != [1] * n or not all(isinstance(v, Fraction) for v in x):
+        print('test case 2 failed')
+    #... which is what plain Fraction Gauss-Jordan gives
+    G = [list(r) for r in rows]
+    for c in range(n):
+        G[c] = [v / G[c][c] for v in G[c]]
+        for r in range(n):
+            if r != c:
+                G[r] = [a - G[r][c] * b for a, b in zip(G[r], G[c])]
+    if [r[n] for r in G] != list(x):
+        print('test case 3 failed')
+
+    #Decimal mode works in its own context at the requested precision
+    x = AugmentedMatrix(rows, 'decimal', 40).solution().basepoint.coordinates
+    if not all(isinstance(v, Decimal) and abs(v - 1) < Decimal('1e-30') for v in x):
+        print('test case 4 failed')
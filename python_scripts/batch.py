@@ -0,0 +1,185 @@
+from vector import numpy
+
+#Status codes returned next to every batched solution
+UNIQUE = 0
+PARALLEL = 1        #no solution: parallel lines, or planes with no common point
+COINCIDENT = 2      #infinitely many solutions
+
+STATUS_NAMES = {UNIQUE: 'unique', PARALLEL: 'parallel', COINCIDENT: 'coincident'}
+
+#Determinants smaller than this times the product of the row norms count as
+#zero; so do elimination pivots smaller than this times the largest entry
+tolerance = 1e-10
+
+ROWS_WRONG_SHAPE_MSG = 'Each stacked equation needs {} coefficients plus a constant term'
+BATCH_SIZES_MUST_MATCH_MSG = 'All stacked inputs should hold the same number of systems'
+SYSTEM_WRONG_SIZE_MSG = 'Each stacked system needs three equations'
+
+
+def pack_equations(equations, dimension):
+    #Lines/Planes or rows of [n_1, ..., n_d, k] -> N x (d+1) rows
+    rows = []
+    for e in equations:
+        if hasattr(e, 'normal_vector'):
+            rows.append(list(e.normal_vector.coordinates) + [e.constant_term])
+        else:
+            rows.append(list(e))
+    for r in rows:
+        if len(r) != dimension + 1:
+            raise ValueError(ROWS_WRONG_SHAPE_MSG.format(dimension))
+    return rows
+
+
+def intersect_lines(A, B):
+    #Intersection of line A[i] with line B[i] for every i by Cramer's rule
+    #(the determinant formula of Line.intersection). Each line is a Line or a
+    #row [a, b, k] for a*x + b*y = k. Returns (points, status); points of
+    #non-unique pairs are nan (None without numpy).
+    if not hasattr(A, 'shape'):
+        A = pack_equations(A, 2)
+    if not hasattr(B, 'shape'):
+        B = pack_equations(B, 2)
+    if len(A) != len(B):
+        raise ValueError(BATCH_SIZES_MUST_MATCH_MSG)
+
+    if numpy is None:
+        points, status = [], []
+        for (a, b, k1), (c, d, k2) in zip(A, B):
+            det = a*d - b*c
+            scale = ((a*a + b*b) * (c*c + d*d)) ** .5
+            if abs(det) > tolerance * scale:
+                det = float(det)
+                points.append(((d*k1 - b*k2) / det, (-c*k1 + a*k2) / det))
+                status.append(UNIQUE)
+            else:
+                points.append(None)
+                scale = ((a*a + b*b + k1*k1) * (c*c + d*d + k2*k2)) ** .5
+                coincident = abs(a*k2 - c*k1) <= tolerance * scale and abs(b*k2 - d*k1) <= tolerance * scale
+                status.append(COINCIDENT if coincident else PARALLEL)
+        return points, status
+
+    A = numpy.asarray(A, dtype=numpy.float64).reshape(-1, 3)
+    B = numpy.asarray(B, dtype=numpy.float64).reshape(-1, 3)
+    a, b, k1 = A[:, 0], A[:, 1], A[:, 2]
+    c, d, k2 = B[:, 0], B[:, 1], B[:, 2]
+    det = a*d - b*c
+    scale = numpy.sqrt((a*a + b*b) * (c*c + d*d))
+    unique = numpy.abs(det) > tolerance * scale
+
+    points = numpy.full((len(A), 2), numpy.nan)
+    safe = numpy.where(unique, det, 1.0)
+    points[unique, 0] = ((d*k1 - b*k2) / safe)[unique]
+    points[unique, 1] = ((-c*k1 + a*k2) / safe)[unique]
+
+    scale = numpy.sqrt((a*a + b*b + k1*k1) * (c*c + d*d + k2*k2))
+    coincident = (numpy.abs(a*k2 - c*k1) <= tolerance * scale) & (numpy.abs(b*k2 - d*k1) <= tolerance * scale)
+    status = numpy.where(unique, UNIQUE, numpy.where(coincident, COINCIDENT, PARALLEL)).astype(numpy.int8)
+    return points, status
+
+
+def det3(m):
+    #Determinants of a stack of 3x3 matrices, written out (Sarrus)
+    return (m[..., 0, 0] * (m[..., 1, 1]*m[..., 2, 2] - m[..., 1, 2]*m[..., 2, 1]) -
+            m[..., 0, 1] * (m[..., 1, 0]*m[..., 2, 2] - m[..., 1, 2]*m[..., 2, 0]) +
+            m[..., 0, 2] * (m[..., 1, 0]*m[..., 2, 1] - m[..., 1, 1]*m[..., 2, 0]))
+
+
+def det3_single(m):
+    return (m[0][0] * (m[1][1]*m[2][2] - m[1][2]*m[2][1]) -
+            m[0][1] * (m[1][0]*m[2][2] - m[1][2]*m[2][0]) +
+            m[0][2] * (m[1][0]*m[2][1] - m[1][1]*m[2][0]))
+
+
+def relative_rank(rows, scale):
+    #Rank by pivoted elimination, counting entries below tolerance * scale
+    #as zero
+    rows = [[float(x) for x in r] for r in rows]
+    rank = 0
+    for col in range(len(rows[0])):
+        if rank == len(rows):
+            break
+        p = max(range(rank, len(rows)), key=lambda r: abs(rows[r][col]))
+        if abs(rows[p][col]) <= tolerance * scale:
+            continue
+        rows[rank], rows[p] = rows[p], rows[rank]
+        pivot = rows[rank]
+        for r in rows[rank+1:]:
+            alpha = r[col] / pivot[col]
+            r[:] = [x - alpha*y for x, y in zip(r, pivot)]
+        rank += 1
+    return rank
+
+
+def classify_singular(coeffs, rhs):
+    #Rank test for one singular system: consistent means infinitely many
+    #solutions, otherwise none. Both ranks are taken relative to the largest
+    #entry of [A | b], on either backend.
+    augmented = [list(r) + [k] for r, k in zip(coeffs, rhs)]
+    scale = max(abs(x) for r in augmented for x in r)
+    if relative_rank([r[:-1] for r in augmented], scale) == relative_rank(augmented, scale):
+        return COINCIDENT
+    return PARALLEL
+
+
+def split_systems(systems):
+    #Systems of three Planes or rows of [n_1, n_2, n_3, k] (or LinearSystems)
+    #-> (N x 3 x 3 coefficients, N x 3 constant terms)
+    coeffs, rhs = [], []
+    for system in systems:
+        rows = pack_equations(getattr(system, 'planes', system), 3)
+        if len(rows) != 3:
+            raise ValueError(SYSTEM_WRONG_SIZE_MSG)
+        coeffs.append([r[:3] for r in rows])
+        rhs.append([r[3] for r in rows])
+    return coeffs, rhs
+
+
+def solve_3x3_batch(coeffs, rhs=None):
+    #Solve coeffs[i] x = rhs[i] for a stack of 3x3 systems (three planes each)
+    #with vectorized Cramer's rule. coeffs is N x 3 x 3 and rhs is N x 3;
+    #without rhs, coeffs is a sequence of systems of three Planes or rows
+    #[n_1, n_2, n_3, k]. Returns (solutions, status) like intersect_lines.
+    if rhs is None:
+        coeffs, rhs = split_systems(coeffs)
+    if len(coeffs) != len(rhs):
+        raise ValueError(BATCH_SIZES_MUST_MATCH_MSG)
+    if numpy is None:
+        solutions, status = [], []
+        for m, k in zip(coeffs, rhs):
+            m = [list(r) for r in m]
+            det = det3_single(m)
+            scale = 1.0
+            for r in m:
+                scale *= sum(x*x for x in r) ** .5
+            if abs(det) > tolerance * scale:
+                x = []
+                for j in range(3):
+                    mj = [r[:j] + [kr] + r[j+1:] for r, kr in zip(m, k)]
+                    x.append(det3_single(mj) / float(det))
+                solutions.append(tuple(x))
+                status.append(UNIQUE)
+            else:
+                solutions.append(None)
+                status.append(classify_singular(m, k))
+        return solutions, status
+
+    M = numpy.asarray(coeffs, dtype=numpy.float64).reshape(-1, 3, 3)
+    k = numpy.asarray(rhs, dtype=numpy.float64).reshape(-1, 3)
+    det = det3(M)
+    scale = numpy.prod(numpy.sqrt(numpy.einsum('nij,nij->ni', M, M)), axis=1)
+    unique = numpy.abs(det) > tolerance * scale
+    safe = numpy.where(unique, det, 1.0)
+
+    solutions = numpy.full((len(M), 3), numpy.nan)
+    for j in range(3):
+        Mj = M.copy()
+        Mj[:, :, j] = k
+        solutions[unique, j] = (det3(Mj) / safe)[unique]
+
+    status = numpy.zeros(len(M), dtype=numpy.int8)
+    #Singular systems are rare; classify them one by one with the same test
+    #as the pure python path
+    for i in numpy.nonzero(~unique)[0]:
+        status[i] = classify_singular(M[i].tolist(), k[i].tolist())
+    return solutions, status
+
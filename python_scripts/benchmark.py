@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import zlib
+from timeit import default_timer
+
+import vector
+from vector import Vector
+from line import Line
+from plane import Plane
+from linsys import LinearSystem
+from augmented import AugmentedMatrix
+from sparse import SparseEquation, SparseSystem
+
+#Every benchmark is timed at a list of sizes: the vector dimension, the
+#number of line/plane pairs or 3x3 systems, or the number of unknowns of a
+#dense or sparse system. Results are keyed 'name/size'.
+FORMAT_VERSION = 1
+
+UNKNOWN_BENCHMARK_MSG = 'Unknown benchmark'
+BASELINE_VERSION_MSG = 'The baseline was written by another version of the benchmark format'
+
+#A benchmark regresses when its best time is this much slower than the
+#baseline's; per-benchmark values can be given to compare()
+threshold = 0.10
+#Each measurement runs the timed call at least this long
+min_time = 0.05
+repeat = 5
+
+#Importing any of these in a fresh interpreter should take less than
+#import_target seconds, not counting the interpreter's own startup
+CORE_MODULES = ('vector', 'line', 'plane', 'linsys')
+import_target = 0.05
+
+SMALL_TO_LARGE = (2, 10, 100, 1000, 10000)
+#Dense elimination is O(n^3) in pure python, so it stops earlier
+DENSE_SIZES = (2, 10, 100)
+
+
+def random_vector(rnd, n):
+    return Vector([rnd.uniform(-10, 10) for i in range(n)])
+
+
+def random_line(rnd):
+    return Line(random_vector(rnd, 2), rnd.uniform(-10, 10))
+
+
+def random_plane(rnd):
+    return Plane(random_vector(rnd, 3), rnd.uniform(-10, 10))
+
+
+def dense_rows(rnd, n, conditioning='well'):
+    #[A | b] rows of an n x n system. well: diagonally dominant, so every
+    #pivot is large; ill: a slightly perturbed Hilbert matrix, whose
+    #condition number grows exponentially with n
+    rows = []
+    for i in range(n):
+        if conditioning == 'well':
+            r = [rnd.uniform(-1, 1) for j in range(n)]
+            r[i] += n
+        else:
+            r = [1.0 / (i + j + 1) + rnd.uniform(-1e-12, 1e-12) for j in range(n)]
+        rows.append(r + [rnd.uniform(-10, 10)])
+    return rows
+
+
+def sparse_system(rnd, n, per_row=5, band=8):
+    #Diagonally dominant n x n system with up to per_row nonzeros in every
+    #row, scattered within band of the diagonal. Fully random columns fill
+    #in to a dense matrix during elimination and time nothing but that.
+    equations = []
+    for i in range(n):
+        near = range(max(0, i - band), min(n, i + band + 1))
+        coefficients = dict((j, rnd.uniform(-1, 1)) for j in rnd.sample(near, min(per_row, len(near))))
+        coefficients[i] = per_row + 1.0
+        equations.append(SparseEquation(coefficients, rnd.uniform(-10, 10), n))
+    return SparseSystem(equations, n)
+
+
+def pairs(make, rnd, n):
+    return [(make(rnd), make(rnd)) for i in range(n)]
+
+
+#name -> (default sizes, setup); setup(rnd, size) returns the call to time
+def vector_add(rnd, n):
+    v, w = random_vector(rnd, n), random_vector(rnd, n)
+    return lambda: v.add(w)
+
+
+def vector_dot(rnd, n):
+    v, w = random_vector(rnd, n), random_vector(rnd, n)
+    return lambda: v.dotprod(w)
+
+
+def vector_scalar(rnd, n):
+    v = random_vector(rnd, n)
+    return lambda: v.scalar(2.5)
+
+
+def vector_magnitude(rnd, n):
+    v = random_vector(rnd, n)
+    return lambda: v.magnitude()
+
+
+def line_intersection(rnd, n):
+    lines = pairs(random_line, rnd, n)
+    return lambda: [a.intersection(b) for a, b in lines]
+
+
+def plane_is_parallel(rnd, n):
+    planes = pairs(random_plane, rnd, n)
+    return lambda: [a.is_parallel(b) for a, b in planes]
+
+
+def plane_is_same(rnd, n):
+    planes = pairs(random_plane, rnd, n)
+    return lambda: [a.is_same(b) for a, b in planes]
+
+
+def system_triangular(rnd, n):
+    systems = [LinearSystem([random_plane(rnd) for i in range(3)]) for j in range(n)]
+    return lambda: [s.compute_triangular_form() for s in systems]
+
+
+def system_rref(rnd, n):
+    systems = [LinearSystem([random_plane(rnd) for i in range(3)]) for j in range(n)]
+    return lambda: [s.compute_rref() for s in systems]
+
+
+def dense_solver(conditioning, method):
+    def setup(rnd, n):
+        rows = dense_rows(rnd, n, conditioning)
+        return lambda: getattr(AugmentedMatrix(rows), method)()
+    return setup
+
+
+def sparse_solve(rnd, n):
+    system = sparse_system(rnd, n)
+    return lambda: system.solve()
+
+
+BENCHMARKS = {
+    'vector.add': (SMALL_TO_LARGE, vector_add),
+    'vector.dotprod': (SMALL_TO_LARGE, vector_dot),
+    'vector.scalar': (SMALL_TO_LARGE, vector_scalar),
+    'vector.magnitude': (SMALL_TO_LARGE, vector_magnitude),
+    'line.intersection': (SMALL_TO_LARGE, line_intersection),
+    'plane.is_parallel': (SMALL_TO_LARGE, plane_is_parallel),
+    'plane.is_same': (SMALL_TO_LARGE, plane_is_same),
+    'linsys.triangular': ((2, 10, 100, 1000), system_triangular),
+    'linsys.rref': ((2, 10, 100, 1000), system_rref),
+    'dense.triangular.well': (DENSE_SIZES, dense_solver('well', 'compute_triangular_form')),
+    'dense.rref.well': (DENSE_SIZES, dense_solver('well', 'compute_rref')),
+    'dense.rref.ill': (DENSE_SIZES, dense_solver('ill', 'compute_rref')),
+    'sparse.solve': (SMALL_TO_LARGE, sparse_solve),
+}
+
+
+def measure(call, min_time=min_time, repeat=repeat):
+    #(best, median) seconds per call over repeat rounds; each round runs
+    #call often enough to take at least min_time
+    number = 1
+    while True:
+        start = default_timer()
+        for i in range(number):
+            call()
+        elapsed = default_timer() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(1.2 * min_time / elapsed) + 1))
+    times = [elapsed / number]
+    for r in range(repeat - 1):
+        start = default_timer()
+        for i in range(number):
+            call()
+        times.append((default_timer() - start) / number)
+    times.sort()
+    return times[0], times[len(times) // 2], number
+
+
+def cold_import_time(module, repeat=repeat):
+    #Best of repeat imports of module, each in a new interpreter
+    code = 'from timeit import default_timer; t = default_timer(); import {}; print(default_timer() - t)'
+    here = os.path.dirname(os.path.abspath(__file__))
+    return min(float(subprocess.check_output([sys.executable, '-c', code.format(module)], cwd=here))
+               for i in range(repeat))
+
+
+def import_times(modules=CORE_MODULES, repeat=repeat):
+    return dict((m, cold_import_time(m, repeat)) for m in modules)
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'vector_backend': vector.backend,
+    }
+
+
+def run(names=None, sizes=None, seed=0, min_time=min_time, repeat=repeat, report=None):
+    #Time the named benchmarks (all by default) at their default sizes, or
+    #at sizes if given. Every (benchmark, size) draws its data from its own
+    #Random(seed), so results do not depend on which others ran.
+    names = sorted(BENCHMARKS) if names is None else names
+    results = {}
+    for name in names:
+        if name not in BENCHMARKS:
+            raise ValueError(UNKNOWN_BENCHMARK_MSG)
+        default_sizes, setup = BENCHMARKS[name]
+        for size in (sizes or default_sizes):
+            stream = zlib.crc32('{}/{}'.format(name, size).encode('ascii')) & 0xffffffff
+            call = setup(random.Random(seed * 2**32 + stream), size)
+            best, median, number = measure(call, min_time, repeat)
+            key = '{}/{}'.format(name, size)
+            results[key] = {'name': name, 'size': size, 'best': best, 'median': median, 'number': number}
+            if report is not None:
+                report(key, results[key])
+    return {'version': FORMAT_VERSION, 'seed': seed, 'environment': environment(), 'results': results}
+
+
+def compare(current, baseline, threshold=threshold, thresholds=None):
+    #(key, baseline best, current best, ratio, regressed) for every result
+    #present in both runs, slowest ratio first. thresholds maps benchmark
+    #names (or name/size keys) to their own allowed slowdown.
+    if baseline.get('version') != FORMAT_VERSION:
+        raise ValueError(BASELINE_VERSION_MSG)
+    thresholds = thresholds or {}
+    rows = []
+    for key, result in current['results'].items():
+        if key not in baseline['results']:
+            continue
+        before = baseline['results'][key]['best']
+        ratio = result['best'] / before if before > 0 else float('inf')
+        allowed = thresholds.get(key, thresholds.get(result['name'], threshold))
+        rows.append((key, before, result['best'], ratio, ratio > 1 + allowed))
+    rows.sort(key=lambda r: -r[3])
+    return rows
+
+
+def regressions(current, baseline, threshold=threshold, thresholds=None):
+    return [r for r in compare(current, baseline, threshold, thresholds) if r[4]]
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time vector, line, plane and linear system operations')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, or prefixes such as vector (default: all)')
+    parser.add_argument('--sizes', help='comma-separated sizes instead of each benchmark\'s defaults')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-time', type=float, default=min_time)
+    parser.add_argument('--repeat', type=int, default=repeat)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=threshold,
+                        help='allowed slowdown against the baseline, e.g. 0.1 for 10%%')
+    parser.add_argument('--imports', action='store_true',
+                        help='also time cold imports and fail if one takes longer than --import-target')
+    parser.add_argument('--import-target', type=float, default=import_target)
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in sorted(BENCHMARKS):
+            print('{:24} {}'.format(name, ', '.join(str(s) for s in BENCHMARKS[name][0])))
+        return 0
+
+    names = None
+    if args.names:
+        names = sorted(set(n for n in BENCHMARKS for prefix in args.names
+                           if n == prefix or n.startswith(prefix + '.')))
+        if not names:
+            parser.error(UNKNOWN_BENCHMARK_MSG)
+    sizes = [int(s) for s in args.sizes.split(',')] if args.sizes else None
+
+    def report(key, result):
+        print('{:32} {:12.3e} s  (median {:.3e}, {} calls)'.format(key, result['best'], result['median'],
+                                                                   result['number']))
+        sys.stdout.flush()
+
+    results = run(names, sizes, args.seed, args.min_time, args.repeat, report)
+    slow_imports = False
+    if args.imports:
+        results['imports'] = import_times(repeat=args.repeat)
+        print('')
+        for module, seconds in sorted(results['imports'].items()):
+            over = seconds > args.import_target
+            slow_imports = slow_imports or over
+            print('import {:25} {:12.3e} s{}'.format(module, seconds, '  OVER TARGET' if over else ''))
+    if args.output:
+        save(results, args.output)
+    if args.baseline:
+        rows = compare(results, load(args.baseline), args.threshold)
+        print('')
+        for key, before, after, ratio, regressed in rows:
+            print('{:32} {:10.3e} -> {:10.3e}  x{:.2f}{}'.format(key, before, after, ratio,
+                                                                 '  REGRESSION' if regressed else ''))
+        if any(r[4] for r in rows):
+            return 1
+    return 1 if slow_imports else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+from vector import numpy
+
+#Columns per panel; tune to the cache size of the machine
+block_size = 64
+
+
+def eliminate(A, ncols, block_size=block_size, tol=1e-10, keep_multipliers=False):
+    #Right-looking blocked Gaussian elimination with partial pivoting on the
+    #numpy matrix A, in place, over its first ncols columns (the remaining
+    #columns, e.g. a right-hand side, are carried along).
+    #
+    #Each panel of block_size columns is eliminated on its own. The rows to
+    #its right are then brought up to date with one unit lower triangular
+    #solve and one matrix-matrix product, instead of one rank-one update per
+    #column.
+    #
+    #Returns (pivot_columns, permutation) where permutation[i] is the original
+    #index of row i. With keep_multipliers the entries below each pivot hold
+    #the L factor (packed LU); otherwise they are zeroed.
+    m = A.shape[0]
+    permutation = numpy.arange(m)
+    pivots = []
+    row = 0
+    col = 0
+    while col < ncols and row < m:
+        end = min(col + block_size, ncols)
+
+        first = row
+        panel = []
+        for c in range(col, end):
+            if row >= m:
+                break
+            p = row + int(numpy.argmax(numpy.abs(A[row:, c])))
+            if abs(A[p, c]) < tol:
+                if not keep_multipliers:
+                    A[row:, c] = 0.0
+                continue
+            if p != row:
+                A[[row, p]] = A[[p, row]]
+                permutation[[row, p]] = permutation[[p, row]]
+            A[row+1:, c] /= A[row, c]
+            A[row+1:, c+1:end] -= numpy.outer(A[row+1:, c], A[row, c+1:end])
+            panel.append(c)
+            row += 1
+
+        k = len(panel)
+        if k and end < A.shape[1]:
+            L11 = numpy.tril(A[first:row][:, panel], -1) + numpy.eye(k)
+            U12 = numpy.linalg.solve(L11, A[first:row, end:])
+            A[first:row, end:] = U12
+            A[row:, end:] -= A[row:][:, panel].dot(U12)
+
+        if not keep_multipliers:
+            for j, c in enumerate(panel):
+                A[first+j+1:, c] = 0.0
+        pivots.extend(panel)
+        col = end
+    return pivots, permutation
+
+
+def back_substitute(A, pivots, block_size=block_size):
+    #Turn the row echelon form left by eliminate() into RREF, one block of
+    #pivot rows at a time from the bottom up
+    r = len(pivots)
+    if not r:
+        return
+    A[:r] /= A[numpy.arange(r), pivots][:, None]
+    A[numpy.arange(r), pivots] = 1.0
+    for end in range(r, 0, -block_size):
+        start = max(0, end - block_size)
+        for i in range(end - 1, start, -1):
+            c = pivots[i]
+            A[start:i] -= numpy.outer(A[start:i, c], A[i])
+            A[start:i, c] = 0.0
+        if start:
+            cols = pivots[start:end]
+            A[:start] -= A[:start][:, cols].dot(A[start:end])
+            A[:start, cols] = 0.0
+
+
+def eliminate_out_of_core(A, ncols, block_size=block_size, tol=1e-10, chunk_size=None):
+    #Same elimination as eliminate(), for an A too large to hold in memory
+    #(e.g. a numpy.memmap). Only one column panel (all remaining rows by
+    #block_size columns) and one chunk of chunk_size trailing columns are in
+    #memory at a time; rows are swapped on disk one pair at a time.
+    #
+    #Returns (pivot_columns, permutation) like eliminate(); entries below the
+    #pivots are zeroed.
+    chunk_size = chunk_size or block_size
+    m, width = A.shape
+    permutation = numpy.arange(m)
+    pivots = []
+    row = 0
+    col = 0
+    while col < ncols and row < m:
+        end = min(col + block_size, ncols)
+        first = row
+
+        P = numpy.array(A[first:, col:end])
+        swaps = []
+        panel = []
+        r = 0
+        for c in range(end - col):
+            if r >= len(P):
+                break
+            p = r + int(numpy.argmax(numpy.abs(P[r:, c])))
+            if abs(P[p, c]) < tol:
+                P[r:, c] = 0.0
+                continue
+            if p != r:
+                P[[r, p]] = P[[p, r]]
+                swaps.append((first + r, first + p))
+            P[r+1:, c] /= P[r, c]
+            P[r+1:, c+1:] -= numpy.outer(P[r+1:, c], P[r, c+1:])
+            panel.append(c)
+            r += 1
+        row = first + r
+
+        for a, b in swaps:
+            A[[a, b]] = A[[b, a]]
+            permutation[[a, b]] = permutation[[b, a]]
+
+        k = len(panel)
+        if k and end < width:
+            L11 = numpy.tril(P[:k][:, panel], -1) + numpy.eye(k)
+            L21 = P[k:][:, panel]
+            for j in range(end, width, chunk_size):
+                T = numpy.array(A[first:, j:j + chunk_size])
+                T[:k] = numpy.linalg.solve(L11, T[:k])
+                T[k:] -= L21.dot(T[:k])
+                A[first:, j:j + chunk_size] = T
+
+        for i, c in enumerate(panel):
+            P[i+1:, c] = 0.0
+        A[first:, col:end] = P
+        pivots.extend(col + c for c in panel)
+        col = end
+    return pivots, permutation
+
+
+def back_substitute_out_of_core(A, pivots, block_size=block_size, chunk_size=None):
+    #back_substitute() for an A too large to hold in memory: a block of pivot
+    #rows is kept in memory and the rows above it are updated chunk_size rows
+    #at a time
+    chunk_size = chunk_size or block_size
+    r = len(pivots)
+    for start in range(0, r, chunk_size):
+        end = min(start + chunk_size, r)
+        B = numpy.array(A[start:end])
+        index = numpy.arange(end - start)
+        B /= B[index, pivots[start:end]][:, None]
+        B[index, pivots[start:end]] = 1.0
+        A[start:end] = B
+
+    for end in range(r, 0, -block_size):
+        start = max(0, end - block_size)
+        U = numpy.array(A[start:end])
+        for i in range(end - start - 1, 0, -1):
+            c = pivots[start + i]
+            U[:i] -= numpy.outer(U[:i, c], U[i])
+            U[:i, c] = 0.0
+        A[start:end] = U
+        cols = pivots[start:end]
+        for s in range(0, start, chunk_size):
+            e = min(s + chunk_size, start)
+            B = numpy.array(A[s:e])
+            B -= B[:, cols].dot(U)
+            B[:, cols] = 0.0
+            A[s:e] = B
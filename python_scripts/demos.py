@@ -0,0 +1,55 @@
+import sys
+from importlib import import_module
+
+#The course exercises and print-based checks, run only on request:
+#
+#  python demos.py                 every demo in order
+#  python demos.py hw1 rref        just those
+#
+#name -> (module, function)
+DEMOS = [
+    ('hw1', ('line', 'hw1')),
+    ('hw2', ('plane', 'hw2')),
+    ('row_ops', ('linsys', 'rowOpsTest')),
+    ('triangular_form', ('linsys', 'triangularFormTest')),
+    ('rref', ('linsys', 'rrefTest')),
+    ('gaussian', ('linsys', 'gaussianTest')),
+    ('elimination', ('augmented', 'eliminationTest')),
+    ('solution', ('solution', 'solutionTest')),
+    ('numeric_modes', ('augmented', 'numericModesTest')),
+    ('incremental', ('incremental', 'incrementalTest')),
+    ('canonical', ('hyperplane', 'canonicalTest')),
+    ('hyperplane_pickle', ('hyperplane', 'pickleTest')),
+    ('geoindex', ('geoindex', 'geoindexTest')),
+    ('least_squares_batch', ('leastsq', 'batchTest')),
+    ('lazy_module', ('vector', 'lazyModuleTest')),
+    ('npy', ('ingest', 'npyTest')),
+    ('replay', ('tracing', 'replayTest')),
+    ('solve_cache', ('solvecache', 'cacheTest')),
+]
+#The asyncio service needs Python 3.7
+if sys.version_info >= (3, 7):
+    DEMOS.append(('service', ('service', 'serviceTest')))
+
+UNKNOWN_DEMO_MSG = 'Unknown demo {}; choose from {}'
+
+
+def run(name):
+    module, function = dict(DEMOS)[name]
+    getattr(import_module(module), function)()
+
+
+def main(argv=None):
+    names = sys.argv[1:] if argv is None else argv
+    known = [name for name, target in DEMOS]
+    for name in names:
+        if name not in known:
+            sys.stderr.write(UNKNOWN_DEMO_MSG.format(name, ', '.join(known)) + '\n')
+            return 2
+    for name in names or known:
+        run(name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+from math import floor
+from heapq import heappush, heappop, heapreplace
+from itertools import product
+
+from vector import Vector, numpy
+from hyperplane import unit_form
+
+
+class HyperplaneIndex(object):
+
+    ALL_MUST_BE_IN_SAME_DIM_MSG = 'All lines or planes in the index should live in the same dimension'
+
+    #Two unit normals (or offsets) closer than this in every coordinate are
+    #the same; it is also the side of the hash buckets
+    tolerance = 1e-10
+    leaf_size = 16
+    #A bucket has 3^d neighbours, so above this many coordinates parallel and
+    #coincident queries search the k-d tree boxes instead
+    grid_dimension_limit = 8
+
+    #Index over a fixed collection of Lines or Planes (anything with a
+    #normal_vector and constant_term), queried by position in that collection.
+    #
+    #Every entry is normalized to unit normal u and offset c, so that
+    #u.x = c is the same hyperplane and |u.p - c| is the distance from p.
+    #
+    #Parallel and coincident queries hash the quantized u (and c) into
+    #buckets of side tolerance and only look at the neighbouring buckets of
+    #the query and of its negation. Distance queries walk a k-d tree over the
+    #points (u, c): the box of a node bounds u.p - c for all of its entries,
+    #so whole subtrees are skipped once they cannot be close enough.
+    def __init__(self, planes, tolerance=None):
+        self.planes = list(planes)
+        if tolerance is not None:
+            self.tolerance = tolerance
+        self.dimension = self.planes[0].dimension if self.planes else 0
+        self.normals = []
+        self.offsets = []
+        self.directions = {}
+        self.hyperplanes = {}
+        self.degenerate = []
+        for i, p in enumerate(self.planes):
+            if p.dimension != self.dimension:
+                raise Exception(self.ALL_MUST_BE_IN_SAME_DIM_MSG)
+            u, c = self.normalize(p.normal_vector, p.constant_term)
+            self.normals.append(u)
+            self.offsets.append(c)
+            if u is None:
+                self.degenerate.append(i)
+                continue
+            self.directions.setdefault(self.cell(u), []).append(i)
+            self.hyperplanes.setdefault(self.cell(u + (c,)), []).append(i)
+        self.build_tree()
+
+    def normalize(self, normal, constant_term=0.0):
+        #(unit normal, offset) as in hyperplane.unit_form, at this index's
+        #tolerance; the normal is None for a zero normal
+        return unit_form(normal, constant_term, self.tolerance)
+
+    def cell(self, values):
+        return tuple(int(floor(x / self.tolerance)) for x in values)
+
+    def neighbours(self, table, values):
+        #Entries in the bucket of values and in every bucket next to it
+        if len(values) > self.grid_dimension_limit:
+            return self.within(values)
+        found = set()
+        for offset in product((-1, 0, 1), repeat=len(values)):
+            key = tuple(k + o for k, o in zip(self.cell(values), offset))
+            found.update(table.get(key, ()))
+        return found
+
+    def close(self, a, b):
+        return all(abs(x - y) <= self.tolerance for x, y in zip(a, b))
+
+    def __len__(self):
+        return len(self.planes)
+
+    def __getitem__(self, i):
+        return self.planes[i]
+
+    def parallel_to(self, normal):
+        #Indices of the entries whose normal is parallel to normal (a Vector,
+        #Line or Plane)
+        if hasattr(normal, 'normal_vector'):
+            normal = normal.normal_vector
+        u = self.normalize(normal)[0]
+        if u is None:
+            return []
+        flipped = tuple(-x for x in u)
+        found = self.neighbours(self.directions, u) | self.neighbours(self.directions, flipped)
+        return sorted(i for i in found
+                      if self.close(self.normals[i], u) or self.close(self.normals[i], flipped))
+
+    def coincident_with(self, plane):
+        #Indices of the entries that are the same line or plane as plane
+        u, c = self.normalize(plane.normal_vector, plane.constant_term)
+        if u is None:
+            return []
+        query = u + (c,)
+        flipped = tuple(-x for x in query)
+        found = self.neighbours(self.hyperplanes, query) | self.neighbours(self.hyperplanes, flipped)
+        return sorted(i for i in found
+                      if self.close(self.normals[i] + (self.offsets[i],), query) or
+                      self.close(self.normals[i] + (self.offsets[i],), flipped))
+
+    def distance(self, i, point):
+        return abs(sum(x*y for x, y in zip(self.normals[i], point)) - self.offsets[i])
+
+    def build_tree(self):
+        #Nodes are stored in parallel lists; the entries of node j are
+        #order[start[j]:end[j]], and leaves keep their unit normals and
+        #offsets contiguous in tree_normals/tree_offsets
+        entries = [i for i, u in enumerate(self.normals) if u is not None]
+        self.order = entries
+        self.lo, self.hi, self.children, self.start, self.end = [], [], [], [], []
+        if entries:
+            self.build_node(0, len(entries))
+        if numpy is not None:
+            self.tree_normals = numpy.array([self.normals[i] for i in entries], dtype=numpy.float64)
+            self.tree_offsets = numpy.array([self.offsets[i] for i in entries], dtype=numpy.float64)
+
+    def build_node(self, start, end):
+        node = len(self.lo)
+        points = [self.normals[i] + (self.offsets[i],) for i in self.order[start:end]]
+        lo = [min(column) for column in zip(*points)]
+        hi = [max(column) for column in zip(*points)]
+        self.lo.append(lo)
+        self.hi.append(hi)
+        self.children.append(None)
+        self.start.append(start)
+        self.end.append(end)
+        if end - start > self.leaf_size:
+            axis = max(range(len(lo)), key=lambda a: hi[a] - lo[a])
+            key = (lambda i: self.offsets[i]) if axis == self.dimension else (lambda i: self.normals[i][axis])
+            self.order[start:end] = sorted(self.order[start:end], key=key)
+            middle = (start + end) // 2
+            left = self.build_node(start, middle)
+            right = self.build_node(middle, end)
+            self.children[node] = (left, right)
+        return node
+
+    def bound(self, node, point):
+        #Smallest |u.p - c| any entry of the node can have
+        low = -self.hi[node][-1]
+        high = -self.lo[node][-1]
+        for lo, hi, x in zip(self.lo[node], self.hi[node], point):
+            a, b = lo * x, hi * x
+            if a > b:
+                a, b = b, a
+            low += a
+            high += b
+        if low > 0:
+            return low
+        if high < 0:
+            return -high
+        return 0.0
+
+    def within(self, values):
+        #Entries whose first len(values) coordinates of (u, c) are all within
+        #tolerance of values, skipping the nodes whose box is farther
+        found = set()
+        stack = [0] if self.lo else []
+        while stack:
+            node = stack.pop()
+            if any(x < lo - self.tolerance or x > hi + self.tolerance
+                   for x, lo, hi in zip(values, self.lo[node], self.hi[node])):
+                continue
+            if self.children[node] is None:
+                found.update(self.order[self.start[node]:self.end[node]])
+            else:
+                stack.extend(self.children[node])
+        return found
+
+    def leaf_distances(self, node, point):
+        start, end = self.start[node], self.end[node]
+        if numpy is not None:
+            d = numpy.abs(self.tree_normals[start:end].dot(point) - self.tree_offsets[start:end])
+            return zip(d.tolist(), self.order[start:end])
+        return [(self.distance(i, point), i) for i in self.order[start:end]]
+
+    def query_point(self, point):
+        if isinstance(point, Vector):
+            point = point.coordinates
+        point = [float(x) for x in point]
+        if numpy is not None:
+            return numpy.array(point)
+        return point
+
+    def containing(self, point, tolerance=None):
+        #Indices of the entries that point lies on
+        if tolerance is None:
+            tolerance = self.tolerance
+        point = self.query_point(point)
+        found = []
+        stack = [0] if self.lo else []
+        while stack:
+            node = stack.pop()
+            if self.bound(node, point) > tolerance:
+                continue
+            if self.children[node] is None:
+                found.extend(i for d, i in self.leaf_distances(node, point) if d <= tolerance)
+            else:
+                stack.extend(self.children[node])
+        return sorted(found)
+
+    def nearest(self, point, k=1):
+        #The k entries closest to point as ascending (distance, index) pairs
+        point = self.query_point(point)
+        best = []
+        queue = [(0.0, 0)] if self.lo else []
+        while queue:
+            bound, node = heappop(queue)
+            if len(best) == k and bound >= -best[0][0]:
+                break
+            if self.children[node] is None:
+                for d, i in self.leaf_distances(node, point):
+                    if len(best) < k:
+                        heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        heapreplace(best, (-d, i))
+            else:
+                for child in self.children[node]:
+                    heappush(queue, (self.bound(child, point), child))
+        return sorted((-d, i) for d, i in best)
+
+    def parallel_batch(self, normals):
+        return [self.parallel_to(n) for n in normals]
+
+    def coincident_batch(self, planes):
+        return [self.coincident_with(p) for p in planes]
+
+    def containing_batch(self, points, tolerance=None):
+        return [self.containing(p, tolerance) for p in points]
+
+    def nearest_batch(self, points, k=1):
+        return [self.nearest(p, k) for p in points]
+
+
+def geoindexTest():
+    print("******\nHYPERPLANE INDEX")
+    import random
+    from hyperplane import Hyperplane
+
+    rnd = random.Random(0)
+
+    def random_planes(d, n):
+        planes = []
+        for i in range(n):
+            choice = rnd.random()
+            if planes and choice < 0.2:
+                #A scaled copy: coincident (and so parallel) with an earlier one
+                p = rnd.choice(planes)
+                s = rnd.choice((-3, -1, 0.5, 2))
+                planes.append(Hyperplane(p.normal_vector.scalar(s), p.constant_term * s))
+            elif planes and choice < 0.4:
+                p = rnd.choice(planes)
+                planes.append(Hyperplane(p.normal_vector.scalar(2), rnd.uniform(-10, 10)))
+            else:
+                planes.append(Hyperplane([rnd.uniform(-10, 10) for j in range(d)], rnd.uniform(-10, 10)))
+        return planes
+
+    #Every query agrees with a scan of all entries, through the grid (d=3)
+    #and through the tree fallback (d=10)
+    case = 0
+    for d in (3, 10):
+        planes = random_planes(d, 200)
+        index = HyperplaneIndex(planes)
+        queries = planes[:20]
+        points = [[rnd.uniform(-10, 10) for j in range(d)] for i in range(20)]
+        points += [list(p.basepoint.coordinates) for p in planes[:5]]
+
+        def parallel(i, q):
+            u = index.normalize(q.normal_vector)[0]
+            return index.close(index.normals[i], u) or index.close(index.normals[i], [-x for x in u])
+
+        case += 1
+        if any(index.parallel_to(q) != [i for i in range(len(planes)) if parallel(i, q)] for q in queries):
+            print('test case {} failed'.format(case))
+        case += 1
+        if any(index.coincident_with(q) != [i for i, p in enumerate(planes) if p == q] for q in queries):
+            print('test case {} failed'.format(case))
+        case += 1
+        #Distances only, as coincident entries tie and either may come fifth;
+        #and with numpy the tree's distances come from a different kernel
+        brute = [sorted(index.distance(i, x) for i in range(len(planes)))[:5] for x in points]
+        found = [[d for d, i in index.nearest(x, 5)] for x in points]
+        if not all(len(a) == len(b) and all(abs(x - y) <= 1e-12 for x, y in zip(a, b))
+                   for a, b in zip(found, brute)):
+            print('test case {} failed'.format(case))
+        case += 1
+        tol = 1e-9
+        brute = [[i for i in range(len(planes)) if index.distance(i, x) <= tol] for x in points]
+        if [index.containing(x, tol) for x in points] != brute:
+            print('test case {} failed'.format(case))
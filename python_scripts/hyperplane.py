@@ -0,0 +1,272 @@
+import sys
+from math import sqrt
+
+import vector
+from vector import Vector, quantize
+
+#Marks a basepoint that has not been worked out yet (None means there is none)
+NOT_COMPUTED = object()
+
+
+class Hyperplane(object):
+
+    NO_NONZERO_ELTS_FOUND_MSG = 'No nonzero elements found'
+    EITHER_DIM_OR_NORMAL_VEC_MUST_BE_PROVIDED_MSG = 'Either the dimension of the hyperplane or the normal vector must be provided'
+    WRONG_DIMENSION_MSG = 'The normal vector should have {} coordinates'
+
+    #Hyperplanes are built for every row operation, so they carry no
+    #__dict__ and only work out their basepoint when it is first asked for
+    __slots__ = ('dimension', 'normal_vector', 'constant_term', '_basepoint')
+
+    #n.x = k in any dimension. The normal may be a Vector or any sequence of
+    #coordinates, which is packed into a Vector (and so into one float
+    #buffer); without one, dimension gives the zero hyperplane. With both,
+    #the normal must have dimension coordinates.
+    def __init__(self, normal_vector=None, constant_term=None, dimension=None):
+        if normal_vector is None:
+            if dimension is None:
+                raise ValueError(self.EITHER_DIM_OR_NORMAL_VEC_MUST_BE_PROVIDED_MSG)
+            normal_vector = Vector([0]*dimension)
+        elif not isinstance(normal_vector, Vector):
+            normal_vector = Vector(normal_vector)
+        if dimension is not None and normal_vector.dimension != dimension:
+            raise ValueError(self.WRONG_DIMENSION_MSG.format(dimension))
+        self.dimension = normal_vector.dimension
+        self.normal_vector = normal_vector
+
+        if not constant_term:
+            constant_term = 0
+        self.constant_term = constant_term
+
+        self._basepoint = NOT_COMPUTED
+
+    def __getstate__(self):
+        #NOT_COMPUTED would come back from pickle or deepcopy as some other
+        #object, so the basepoint is left out and worked out again on demand
+        return self.dimension, self.normal_vector, self.constant_term
+
+    def __setstate__(self, state):
+        self.dimension, self.normal_vector, self.constant_term = state
+        self._basepoint = NOT_COMPUTED
+
+    @property
+    def basepoint(self):
+        if self._basepoint is NOT_COMPUTED:
+            self.set_basepoint()
+        return self._basepoint
+
+    def set_basepoint(self):
+        #None for a zero normal vector, which has no basepoint
+        try:
+            initial_index = self.first_nonzero_index(self.normal_vector)
+        except Exception as e:
+            if str(e) == self.NO_NONZERO_ELTS_FOUND_MSG:
+                self._basepoint = None
+                return
+            raise e
+        basepoint_coords = [0]*self.dimension
+        basepoint_coords[initial_index] = self.constant_term/self.normal_vector[initial_index]
+        self._basepoint = Vector(basepoint_coords)
+
+    def __str__(self):
+
+        num_decimal_places = 3
+
+        def write_coefficient(coefficient, is_initial_term=False):
+            coefficient = round(coefficient, num_decimal_places)
+            if coefficient % 1 == 0:
+                coefficient = int(coefficient)
+
+            output = ''
+
+            if coefficient < 0:
+                output += '-'
+            if coefficient > 0 and not is_initial_term:
+                output += '+'
+
+            if not is_initial_term:
+                output += ' '
+
+            if abs(coefficient) != 1:
+                output += '{}'.format(abs(coefficient))
+
+            return output
+
+        n = self.normal_vector
+
+        try:
+            initial_index = self.first_nonzero_index(n)
+            terms = [write_coefficient(n[i], is_initial_term=(i==initial_index)) + 'x_{}'.format(i+1)
+                     for i in range(self.dimension) if round(n[i], num_decimal_places) != 0]
+            output = ' '.join(terms)
+
+        except Exception as e:
+            if str(e) == self.NO_NONZERO_ELTS_FOUND_MSG:
+                output = '0'
+            else:
+                raise e
+
+        constant = round(self.constant_term, num_decimal_places)
+        if constant % 1 == 0:
+            constant = int(constant)
+        output += ' = {}'.format(constant)
+
+        return output
+
+    def is_parallel(self, p):
+        return (self.normal_vector).is_parallel(p.normal_vector)
+
+    def is_same(self, p):
+        difference = self.basepoint.subtract(p.basepoint)
+        return difference.is_orthogonal(p.normal_vector)
+
+    is_coincident = is_same
+
+    def intersection(self, *others):
+        #Solution set of this and the other hyperplanes taken together
+        from augmented import AugmentedMatrix
+        return AugmentedMatrix.from_planes((self,) + others).solution()
+
+    def canonical(self, step=None):
+        return canonical_form(self.normal_vector, self.constant_term, step)
+
+    def parallel_key(self, step=None):
+        #Equal for hyperplanes with parallel normals, to group them in a dict
+        return self.normal_vector.direction(step)[0]
+
+    def __eq__(self, p):
+        #Same hyperplane up to scaling: equal canonical forms, which is also
+        #what __hash__ uses, so a dict or set of hyperplanes drops duplicates
+        if not isinstance(p, Hyperplane):
+            return NotImplemented
+        return self.dimension == p.dimension and self.canonical() == p.canonical()
+
+    def __ne__(self, p):
+        equal = self.__eq__(p)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.canonical())
+
+    @staticmethod
+    def first_nonzero_index(iterable):
+        for k, item in enumerate(iterable):
+            if not is_near_zero(item):
+                return k
+        raise Exception(Hyperplane.NO_NONZERO_ELTS_FOUND_MSG)
+
+
+def make_my_decimal():
+    from decimal import Decimal
+
+    class MyDecimal(Decimal):
+        def is_near_zero(self, eps=1e-10):
+            return abs(self) < eps
+    MyDecimal.__qualname__ = 'MyDecimal'
+    return MyDecimal
+
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        #MyDecimal is made on first use, so importing this module does not
+        #import decimal; Python 2 has no module __getattr__ and makes it here
+        global MyDecimal
+        if name == 'MyDecimal':
+            MyDecimal = make_my_decimal()
+            return MyDecimal
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+else:
+    MyDecimal = make_my_decimal()
+
+
+def unit_form(normal_vector, constant_term, tolerance=None):
+    #(unit normal, offset) of n.x = k: the normal scaled to unit length with
+    #its first clearly nonzero coordinate positive, and k scaled the same
+    #way, so that u.x = c is the same hyperplane. A zero normal gives
+    #(None, k) as there is no direction to scale by.
+    tolerance = tolerance or vector.tolerance
+    n = [float(x) for x in normal_vector]
+    size = sqrt(sum(x*x for x in n))
+    if size < tolerance:
+        return None, float(constant_term)
+    u = [x / size for x in n]
+    c = float(constant_term) / size
+    for x in u:
+        if abs(x) > tolerance:
+            if x < 0:
+                u = [-y for y in u]
+                c = -c
+            break
+    return tuple(u), c
+
+
+def canonical_form(normal_vector, constant_term, step=None):
+    #unit_form quantized to step; equal forms mean the same hyperplane
+    u, c = unit_form(normal_vector, constant_term, step)
+    return (None if u is None else quantize(u, step)), quantize([c], step)[0]
+
+
+def is_near_zero(x, eps=1e-10):
+    #Same test as MyDecimal.is_near_zero, but also for Fraction coefficients
+    return abs(x) < eps
+
+
+def hyperplane_type(dimension):
+    #Line in 2 dimensions, Plane in 3, Hyperplane otherwise
+    if dimension == 2:
+        from line import Line
+        return Line
+    if dimension == 3:
+        from plane import Plane
+        return Plane
+    return Hyperplane
+
+
+def pickleTest():
+    print("******\nHYPERPLANE PICKLE")
+    import copy
+    import pickle
+
+    from line import Line
+    from plane import Plane
+
+    case = 0
+    for p in (Line(Vector([4.046, 2.836]), 1.21), Plane(Vector([1, 2, 3]), 4), Hyperplane([0, 1, 0, 2], 3),
+              Plane(constant_term=1)):
+        for touched in (False, True):
+            if touched:
+                p.basepoint
+            copies = [pickle.loads(pickle.dumps(p, protocol)) for protocol in range(2, pickle.HIGHEST_PROTOCOL + 1)]
+            copies.append(copy.deepcopy(p))
+            case += 1
+            if not all(type(q) is type(p) and q == p for q in copies):
+                print('test case {} failed'.format(case))
+            case += 1
+            #The basepoint is worked out again, so is_same works on the copies
+            if p.basepoint is not None and not all(q.is_same(p) == 'Orthogonal' for q in copies):
+                print('test case {} failed'.format(case))
+            if p.basepoint is None and not all(q.basepoint is None for q in copies):
+                print('test case {} failed'.format(case))
+
+
+def canonicalTest():
+    print("******\nCANONICAL FORMS")
+    import random
+
+    rnd = random.Random(0)
+    step = vector.tolerance
+    #Pairs a hair apart around random bucket edges: equality and hashing
+    #always agree
+    for i in range(200):
+        edge = (rnd.randint(-10**6, 10**6) + 0.5) * step
+        a = Vector([edge - 1e-13, 1.0])
+        b = Vector([edge + 1e-13, 1.0])
+        if a == b and hash(a) != hash(b):
+            print('test case 1 failed')
+            break
+
+    #Scaled and flipped copies collapse to one entry of a set
+    planes = [Hyperplane([1, 2, 3], 4), Hyperplane([-2, -4, -6], -8), Hyperplane([0.5, 1, 1.5], 2),
+              Hyperplane([1, 2, 3], 5), Hyperplane([0, 0, 0], 0), Hyperplane([0, 0, 0], 0)]
+    if len(set(planes)) != 3:
+        print('test case 2 failed')
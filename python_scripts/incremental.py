@@ -0,0 +1,315 @@
+from vector import Vector, numpy
+from solution import Solution
+
+
+def row_array(values):
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.float64)
+    return [float(x) for x in values]
+
+
+def unit_row(length, i):
+    row = row_array([0.0] * length)
+    row[i] = 1.0
+    return row
+
+
+def add_multiple(dst, coefficient, src):
+    #dst + coefficient*src
+    if numpy is not None:
+        return dst + coefficient * src
+    return [x + coefficient*y for x, y in zip(dst, src)]
+
+
+def scale_row(row, coefficient):
+    if numpy is not None:
+        return row * coefficient
+    return [x * coefficient for x in row]
+
+
+def insert_entry(row, index, value):
+    if numpy is not None:
+        return numpy.insert(row, index, value)
+    return row[:index] + [value] + row[index:]
+
+
+def delete_entry(row, index):
+    if numpy is not None:
+        return numpy.delete(row, index)
+    return row[:index] + row[index+1:]
+
+
+def max_abs(row, stop=None):
+    #(index, |value|) of the largest entry among the first stop
+    values = row[:stop]
+    if numpy is not None:
+        i = int(numpy.argmax(numpy.abs(values)))
+    else:
+        i = max(range(len(values)), key=lambda j: abs(values[j]))
+    return i, abs(values[i])
+
+
+class IncrementalSystem(object):
+
+    NO_EQUATIONS_MSG = 'An empty incremental system needs its dimension'
+    ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG = 'All planes in the system should live in the same dimension'
+
+    zero_tolerance = 1e-10
+    #Refactor once the transform has grown this much past its last refactored
+    #size. Updates lose about log10(growth) digits of the float64 working
+    #precision, so this keeps some 12 of the 16.
+    growth_limit = 1e4
+
+    #Linear system kept in Gauss-Jordan form while equations come and go.
+    #rows[k] = sum over i of transforms[k][i] * (equation i as [n | k]), and
+    #each row either has a pivot (a 1 in column pivots[k], 0 in every other
+    #pivot column) or a zero coefficient part. Because the transform is
+    #invertible the rows have exactly the solutions of the equations.
+    #
+    #Appending an equation reduces it against the pivot rows and, when
+    #something is left, pivots on it (a rank-one update, O(m*(n+m))).
+    #Deleting one eliminates its column of the transform from every row but
+    #one and drops that row (a downdate of the same cost). Changing only a
+    #constant term moves the right-hand sides along one transform column,
+    #O(m). A full refactorization is only done when the transform grows too
+    #large to trust; a larger growth_limit refactors less often at the cost
+    #of accuracy.
+    def __init__(self, planes=(), dimension=None, growth_limit=None):
+        if growth_limit is not None:
+            self.growth_limit = growth_limit
+        planes = list(planes)
+        if dimension is None:
+            if not planes:
+                raise ValueError(self.NO_EQUATIONS_MSG)
+            dimension = planes[0].dimension
+        for p in planes:
+            self.check_dimension(p, dimension)
+        self.dimension = dimension
+        self.planes = planes
+        self.refactorizations = 0
+        self.refactor()
+
+    def check_dimension(self, plane, dimension=None):
+        if plane.dimension != (dimension or self.dimension):
+            raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
+
+    def equation_row(self, plane):
+        return row_array(list(plane.normal_vector.coordinates) + [plane.constant_term])
+
+    def refactor(self):
+        #Gauss-Jordan with partial pivoting on [A | b | I]
+        m = len(self.planes)
+        self.rows = [self.equation_row(p) for p in self.planes]
+        self.transforms = [unit_row(m, i) for i in range(m)]
+        self.pivots = [None] * m
+        row = 0
+        for col in range(self.dimension):
+            if row >= m:
+                break
+            p = max(range(row, m), key=lambda r: abs(self.rows[r][col]))
+            if abs(self.rows[p][col]) < self.zero_tolerance:
+                continue
+            self.rows[row], self.rows[p] = self.rows[p], self.rows[row]
+            self.transforms[row], self.transforms[p] = self.transforms[p], self.transforms[row]
+            self.pivot_on(row, col)
+            row += 1
+        self.refactorizations += 1
+        self.baseline_growth = self.growth()
+
+    def growth(self):
+        return max([1.0] + [max_abs(t)[1] for t in self.transforms if len(t)])
+
+    def pivot_on(self, k, col):
+        #Scale row k to a leading 1 in col and clear col from every other row
+        f = 1.0 / self.rows[k][col]
+        self.rows[k] = scale_row(self.rows[k], f)
+        self.transforms[k] = scale_row(self.transforms[k], f)
+        self.rows[k][col] = 1.0
+        for j in range(len(self.rows)):
+            alpha = self.rows[j][col]
+            if j != k and alpha:
+                self.rows[j] = add_multiple(self.rows[j], -alpha, self.rows[k])
+                self.transforms[j] = add_multiple(self.transforms[j], -alpha, self.transforms[k])
+                self.rows[j][col] = 0.0
+        self.pivots[k] = col
+
+    def promote(self, k):
+        #Give a row that has no pivot one, if its coefficients are not all zero
+        if self.pivots[k] is not None:
+            return False
+        col, size = max_abs(self.rows[k], self.dimension)
+        if size < self.zero_tolerance:
+            return False
+        self.pivot_on(k, col)
+        return True
+
+    def check_growth(self, rows):
+        if max(max_abs(self.transforms[k])[1] for k in rows) > self.growth_limit * self.baseline_growth:
+            self.refactor()
+
+    def insert(self, i, plane):
+        self.check_dimension(plane)
+        m = len(self.planes)
+        self.transforms = [insert_entry(t, i, 0.0) for t in self.transforms]
+        row = self.equation_row(plane)
+        transform = unit_row(m+1, i)
+        for k, col in enumerate(self.pivots):
+            alpha = row[col] if col is not None else 0
+            if alpha:
+                row = add_multiple(row, -alpha, self.rows[k])
+                transform = add_multiple(transform, -alpha, self.transforms[k])
+                row[col] = 0.0
+        self.planes.insert(i, plane)
+        self.rows.append(row)
+        self.transforms.append(transform)
+        self.pivots.append(None)
+        self.promote(m)
+        self.check_growth([m])
+        return self.status()
+
+    def append(self, plane):
+        return self.insert(len(self.planes), plane)
+
+    def delete(self, i):
+        #Pick the row that depends most on equation i, preferring one without
+        #a pivot so that the rank only drops when it has to. Rounding leaves
+        #tiny entries where there should be zeros, so a row only counts as
+        #depending on equation i relative to the largest entry.
+        column = [t[i] for t in self.transforms]
+        cutoff = self.zero_tolerance * max(abs(x) for x in column)
+        candidates = [k for k, col in enumerate(self.pivots) if col is None and abs(column[k]) > cutoff]
+        if not candidates:
+            candidates = range(len(column))
+        k = max(candidates, key=lambda j: abs(column[j]))
+
+        touched = []
+        for j in range(len(self.rows)):
+            f = column[j] / column[k]
+            if j != k and f:
+                self.rows[j] = add_multiple(self.rows[j], -f, self.rows[k])
+                self.transforms[j] = add_multiple(self.transforms[j], -f, self.transforms[k])
+                touched.append(j)
+        removed_pivot = self.pivots[k]
+        del self.rows[k], self.transforms[k], self.pivots[k]
+        self.transforms = [delete_entry(t, i) for t in self.transforms]
+        del self.planes[i]
+
+        if removed_pivot is not None:
+            #Rows without a pivot picked up part of the deleted pivot row
+            for j, col in enumerate(self.pivots):
+                if col is None:
+                    self.promote(j)
+        if touched:
+            self.check_growth([j if j < k else j-1 for j in touched])
+        return self.status()
+
+    def replace(self, i, plane):
+        self.check_dimension(plane)
+        old = self.planes[i]
+        if old.normal_vector.coordinates == plane.normal_vector.coordinates:
+            #Only the constant term moved: b += delta * e_i, so rows += delta * T e_i
+            delta = float(plane.constant_term) - float(old.constant_term)
+            n = self.dimension
+            for k, t in enumerate(self.transforms):
+                if t[i]:
+                    self.rows[k][n] += delta * t[i]
+            self.planes[i] = plane
+            return self.status()
+        self.delete(i)
+        return self.insert(i, plane)
+
+    def rank(self):
+        return sum(1 for col in self.pivots if col is not None)
+
+    def is_consistent(self):
+        n = self.dimension
+        return all(abs(self.rows[k][n]) < self.zero_tolerance
+                   for k, col in enumerate(self.pivots) if col is None)
+
+    def status(self):
+        #(rank, consistent) after the latest change
+        return self.rank(), self.is_consistent()
+
+    def solution(self):
+        n = self.dimension
+        rank = self.rank()
+        if not self.is_consistent():
+            return Solution.none(rank)
+
+        pivot_rows = [(k, col) for k, col in enumerate(self.pivots) if col is not None]
+        basepoint = [0.0] * n
+        for k, col in pivot_rows:
+            basepoint[col] = float(self.rows[k][n])
+        if rank == n:
+            return Solution(Solution.UNIQUE, Vector(basepoint), rank=rank)
+
+        pivots = set(col for k, col in pivot_rows)
+        directions = []
+        for free in range(n):
+            if free in pivots:
+                continue
+            direction = [0.0] * n
+            direction[free] = 1.0
+            for k, col in pivot_rows:
+                direction[col] = -float(self.rows[k][free])
+            directions.append(Vector(direction))
+        return Solution(Solution.INFINITE, Vector(basepoint), directions, rank)
+
+    def __len__(self):
+        return len(self.planes)
+
+    def __getitem__(self, i):
+        return self.planes[i]
+
+    def __setitem__(self, i, plane):
+        self.replace(i, plane)
+
+    def __delitem__(self, i):
+        self.delete(i)
+
+
+def incrementalTest():
+    print("******\nINCREMENTAL SYSTEM")
+    import random
+    from hyperplane import Hyperplane
+    from augmented import AugmentedMatrix
+
+    def same(a, b, planes):
+        #Same solution set; the free variables may be chosen differently
+        if a.kind != b.kind or a.rank != b.rank:
+            return False
+        if a.is_inconsistent():
+            return True
+        if a.is_unique():
+            return max(abs(x - y) for x, y in zip(a.basepoint, b.basepoint)) < 1e-8
+        return all(abs(p.normal_vector.dotprod(a.basepoint) - p.constant_term) < 1e-8 and
+                   all(abs(p.normal_vector.dotprod(v)) < 1e-8 for v in a.direction_vectors)
+                   for p in planes)
+
+    rnd = random.Random(0)
+    base = [Hyperplane([rnd.randint(-5, 5) for j in range(4)], rnd.randint(-5, 5)) for i in range(3)]
+
+    def random_plane():
+        #Mostly new equations, sometimes a combination of two in the system
+        #(so the rank stays) or one with a shifted constant (inconsistent)
+        choice = rnd.random()
+        if choice < 0.6 or len(system) < 2:
+            return Hyperplane([rnd.randint(-5, 5) for j in range(4)], rnd.randint(-5, 5))
+        p, q = rnd.sample(list(system.planes), 2)
+        n = p.normal_vector.add(q.normal_vector)
+        return Hyperplane(n, p.constant_term + q.constant_term + (choice > 0.85))
+
+    #Every step matches a fresh solve of the same equations
+    system = IncrementalSystem(base)
+    for step in range(60):
+        action = rnd.random()
+        if len(system) < 2 or (action < 0.45 and len(system) < 6):
+            system.insert(rnd.randint(0, len(system)), random_plane())
+        elif action < 0.8 or len(system) >= 6:
+            system.delete(rnd.randrange(len(system)))
+        else:
+            i = rnd.randrange(len(system))
+            p = system[i]
+            system[i] = Hyperplane(p.normal_vector, p.constant_term + rnd.randint(-3, 3))
+        if not same(system.solution(), AugmentedMatrix.from_planes(system.planes).solution(), system.planes):
+            print('test case {} failed'.format(step + 1))
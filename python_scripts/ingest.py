@@ -0,0 +1,337 @@
+import csv
+import os
+import struct
+import sys
+from ast import literal_eval
+from array import array
+
+from vector import numpy
+from augmented import AugmentedMatrix
+from sparse import SparseSystem
+
+#Every format holds the augmented matrix [A | b]: one equation per row, the
+#last column is the constant term.
+FORMATS = ('csv', 'npy', 'mtx')
+EXTENSIONS = {'.csv': 'csv', '.txt': 'csv', '.npy': 'npy', '.mtx': 'mtx'}
+
+UNKNOWN_FORMAT_MSG = 'Unknown coefficient file format'
+ROWS_WRONG_LENGTH_MSG = 'All rows of the file should have the same length'
+BAD_NPY_MSG = 'Without numpy only 2-d little-endian float64 C-order .npy files can be read'
+BAD_MATRIX_MARKET_MSG = 'Not a real, integer or pattern MatrixMarket matrix'
+MAPPED_STORAGE_NEEDS_NUMPY_MSG = 'Memory-mapped storage needs numpy'
+
+#Rows (or MatrixMarket entries) handled at a time
+chunk_rows = 4096
+
+
+def guess_format(path, format=None):
+    if format is None:
+        format = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if format not in FORMATS:
+        raise ValueError(UNKNOWN_FORMAT_MSG)
+    return format
+
+
+def csv_chunks(path, chunk_rows=chunk_rows, delimiter=','):
+    #Lists of up to chunk_rows rows; blank lines and # comments are skipped
+    with open(path) as f:
+        chunk = []
+        for record in csv.reader(f, delimiter=delimiter):
+            if not ''.join(record).strip() or record[0].lstrip().startswith('#'):
+                continue
+            chunk.append([float(x) for x in record])
+            if len(chunk) == chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def npy_header(f):
+    #(shape, fortran_order, dtype descr) of an open .npy file, leaving f at
+    #the start of the data
+    if f.read(6) != b'\x93NUMPY':
+        raise ValueError(BAD_NPY_MSG)
+    major = ord(f.read(2)[:1])
+    if major == 1:
+        size = struct.unpack('<H', f.read(2))[0]
+    else:
+        size = struct.unpack('<I', f.read(4))[0]
+    header = literal_eval(f.read(size).decode('latin1'))
+    return tuple(header['shape']), header['fortran_order'], header['descr']
+
+
+def npy_chunks(path, chunk_rows=chunk_rows):
+    #float64 blocks of up to chunk_rows rows, read through a memory map
+    if numpy is not None:
+        A = numpy.load(path, mmap_mode='r')
+        if A.ndim != 2:
+            raise ValueError(ROWS_WRONG_LENGTH_MSG)
+        for start in range(0, len(A), chunk_rows):
+            yield numpy.array(A[start:start + chunk_rows], dtype=numpy.float64)
+        return
+
+    with open(path, 'rb') as f:
+        shape, fortran_order, descr = npy_header(f)
+        if len(shape) != 2 or fortran_order or descr != '<f8':
+            raise ValueError(BAD_NPY_MSG)
+        m, n = shape
+        for start in range(0, m, chunk_rows):
+            k = min(chunk_rows, m - start)
+            values = array('d')
+            values.fromfile(f, k * n)
+            if sys.byteorder == 'big':
+                values.byteswap()
+            yield [values[i*n:(i+1)*n].tolist() for i in range(k)]
+
+
+def row_chunks(path, format=None, chunk_rows=chunk_rows):
+    format = guess_format(path, format)
+    if format == 'csv':
+        return csv_chunks(path, chunk_rows)
+    if format == 'npy':
+        return npy_chunks(path, chunk_rows)
+    raise ValueError(UNKNOWN_FORMAT_MSG)
+
+
+def matrix_market_header(f):
+    #(layout, field, symmetry, rows, columns) from the banner and size line
+    banner = f.readline().lower().split()
+    if (len(banner) != 5 or banner[0] != '%%matrixmarket' or banner[1] != 'matrix' or
+            banner[2] not in ('coordinate', 'array') or
+            banner[3] not in ('real', 'integer', 'pattern') or
+            banner[4] not in ('general', 'symmetric', 'skew-symmetric')):
+        raise ValueError(BAD_MATRIX_MARKET_MSG)
+    line = f.readline()
+    while line.startswith('%') or not line.strip():
+        line = f.readline()
+    sizes = [int(x) for x in line.split()]
+    return banner[2], banner[3], banner[4], sizes[0], sizes[1]
+
+
+def matrix_market_entries(f, header):
+    #(i, j, value) with zero-based indices for every stored entry, mirrored
+    #for symmetric and skew-symmetric files
+    layout, field, symmetry, m, n = header
+    mirror = {'symmetric': 1.0, 'skew-symmetric': -1.0}.get(symmetry)
+    if layout == 'coordinate':
+        for line in f:
+            parts = line.split()
+            if not parts or parts[0].startswith('%'):
+                continue
+            i, j = int(parts[0]) - 1, int(parts[1]) - 1
+            value = float(parts[2]) if field != 'pattern' else 1.0
+            yield i, j, value
+            if mirror and i != j:
+                yield j, i, mirror * value
+        return
+
+    #Dense layout: column by column, only the lower triangle when mirrored
+    values = (float(x) for line in f if not line.startswith('%') for x in line.split())
+    for j in range(n):
+        first = 0 if mirror is None else (j if mirror > 0 else j + 1)
+        for i in range(first, m):
+            value = next(values)
+            yield i, j, value
+            if mirror and i != j:
+                yield j, i, mirror * value
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def file_shape(path, format=None):
+    #(rows, columns) of the augmented matrix; a CSV has to be read once for it
+    format = guess_format(path, format)
+    if format == 'mtx':
+        with open(path) as f:
+            return matrix_market_header(f)[3:]
+    if format == 'npy':
+        with open(path, 'rb') as f:
+            shape = npy_header(f)[0]
+        if len(shape) != 2:
+            raise ValueError(ROWS_WRONG_LENGTH_MSG)
+        return shape
+    rows, columns = 0, 0
+    for chunk in csv_chunks(path):
+        rows += len(chunk)
+        columns = columns or len(chunk[0])
+    return rows, columns
+
+
+def mapped_matrix(path, rows, columns):
+    #New zero-filled float64 matrix backed by a .npy file
+    if numpy is None:
+        raise Exception(MAPPED_STORAGE_NEEDS_NUMPY_MSG)
+    return numpy.lib.format.open_memmap(path, mode='w+', dtype=numpy.float64, shape=(rows, columns))
+
+
+def open_mapped(path, mode='r+'):
+    #Existing .npy matrix, memory-mapped instead of read into memory
+    if numpy is None:
+        raise Exception(MAPPED_STORAGE_NEEDS_NUMPY_MSG)
+    return numpy.load(path, mmap_mode=mode)
+
+
+def fill(A, path, format=None, chunk_rows=chunk_rows):
+    #Copy the file into the rows x columns matrix A chunk by chunk
+    format = guess_format(path, format)
+    if format == 'mtx':
+        with open(path) as f:
+            header = matrix_market_header(f)
+            for batch in batches(matrix_market_entries(f, header), chunk_rows):
+                if numpy is not None:
+                    rows, cols, values = zip(*batch)
+                    A[list(rows), list(cols)] = values
+                else:
+                    for i, j, value in batch:
+                        A[i][j] = value
+        return A
+
+    width = len(A[0])
+    start = 0
+    for chunk in row_chunks(path, format, chunk_rows):
+        if numpy is None or not isinstance(chunk, numpy.ndarray):
+            for r in chunk:
+                if len(r) != width:
+                    raise ValueError(ROWS_WRONG_LENGTH_MSG)
+        A[start:start + len(chunk)] = chunk
+        start += len(chunk)
+    return A
+
+
+def load_dense(path, format=None, out=None, chunk_rows=chunk_rows):
+    #AugmentedMatrix of a CSV, NPY or MatrixMarket file. With out, the matrix
+    #is written to that .npy file and memory-mapped, so it can be larger than
+    #memory; compute_rref() then eliminates it out of core.
+    format = guess_format(path, format)
+    m, width = file_shape(path, format)
+    if out is not None:
+        A = fill(mapped_matrix(out, m, width), path, format, chunk_rows)
+        A.flush()
+        return AugmentedMatrix(A, copy=False)
+    if numpy is not None:
+        A = numpy.zeros((m, width))
+    else:
+        A = [[0.0] * width for i in range(m)]
+    return AugmentedMatrix(fill(A, path, format, chunk_rows), copy=False)
+
+
+def load_sparse(path, format=None, chunk_rows=chunk_rows):
+    #SparseSystem of a CSV, NPY or MatrixMarket file, built straight into
+    #compressed rows; only the nonzero coefficients are ever kept
+    format = guess_format(path, format)
+    tol = SparseSystem.zero_tolerance
+    indptr = array('l', [0])
+    indices = array('l')
+    data = array('d')
+
+    if format == 'mtx':
+        with open(path) as f:
+            header = matrix_market_header(f)
+            m, width = header[3:]
+            rhs = array('d', [0.0] * m)
+            rows = array('l')
+            for i, j, value in matrix_market_entries(f, header):
+                if j == width - 1:
+                    rhs[i] = value
+                elif abs(value) >= tol:
+                    rows.append(i)
+                    indices.append(j)
+                    data.append(value)
+        if numpy is not None:
+            order = numpy.lexsort((numpy.frombuffer(indices, dtype='i{}'.format(indices.itemsize)),
+                                   numpy.frombuffer(rows, dtype='i{}'.format(rows.itemsize)))).tolist()
+        else:
+            order = sorted(range(len(rows)), key=lambda k: (rows[k], indices[k]))
+        counts = [0] * m
+        for i in rows:
+            counts[i] += 1
+        for c in counts:
+            indptr.append(indptr[-1] + c)
+        indices = array('l', [indices[k] for k in order])
+        data = array('d', [data[k] for k in order])
+        return SparseSystem.from_csr(indptr, indices, data, rhs, width - 1)
+
+    rhs = array('d')
+    width = None
+    for chunk in row_chunks(path, format, chunk_rows):
+        if numpy is not None:
+            chunk = numpy.asarray(chunk, dtype=numpy.float64)
+            width = width or chunk.shape[1]
+            if chunk.ndim != 2 or chunk.shape[1] != width:
+                raise ValueError(ROWS_WRONG_LENGTH_MSG)
+            keep = numpy.abs(chunk[:, :-1]) >= tol
+            indices.extend(numpy.nonzero(keep)[1].tolist())
+            data.extend(chunk[:, :-1][keep].tolist())
+            for c in keep.sum(axis=1).tolist():
+                indptr.append(indptr[-1] + c)
+            rhs.extend(chunk[:, -1].tolist())
+            continue
+        for r in chunk:
+            width = width or len(r)
+            if len(r) != width:
+                raise ValueError(ROWS_WRONG_LENGTH_MSG)
+            for j in range(width - 1):
+                if abs(r[j]) >= tol:
+                    indices.append(j)
+                    data.append(r[j])
+            indptr.append(len(indices))
+            rhs.append(r[-1])
+    return SparseSystem.from_csr(indptr, indices, data, rhs, width - 1)
+
+
+def write_npy(path, rows):
+    #Version 1.0 .npy of float64 rows, without needing numpy
+    m, n = len(rows), len(rows[0])
+    header = "{{'descr': '<f8', 'fortran_order': False, 'shape': ({}, {}), }}".format(m, n)
+    header += ' ' * (63 - (10 + len(header)) % 64) + '\n'
+    values = array('d', [float(x) for r in rows for x in r])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    with open(path, 'wb') as f:
+        f.write(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1'))
+        f.write(values.tobytes() if hasattr(values, 'tobytes') else values.tostring())
+
+
+def npyTest():
+    print("******\nNPY INGEST")
+    import shutil
+    import tempfile
+    rows = [[2.0, 1.0, 0.0, 4.0], [1.0, 3.0, 1.0, 5.0], [0.0, 1.0, 4.0, 6.0]]
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'system.npy')
+        write_npy(path, rows)
+        if file_shape(path) != (3, 4):
+            print('test case 1 failed')
+
+        #numpy.load (through the lazy numpy module) when numpy is there
+        A = load_dense(path)
+        if [[float(x) for x in r] for r in A.rows] != rows:
+            print('test case 2 failed')
+        x = A.compute_rref().solution().basepoint.coordinates
+        if any(abs(sum(a*b for a, b in zip(r[:-1], x)) - r[-1]) > 1e-9 for r in rows):
+            print('test case 3 failed')
+
+        sparse = load_sparse(path)
+        if sparse.nnz() != 7 or list(sparse.rhs) != [4.0, 5.0, 6.0]:
+            print('test case 4 failed')
+
+        if numpy is not None:
+            mapped = open_mapped(path, mode='r')
+            if mapped.tolist() != rows:
+                print('test case 5 failed')
+            B = load_dense(path, out=os.path.join(directory, 'copy.npy'))
+            if [[float(x) for x in r] for r in B.rows] != rows:
+                print('test case 6 failed')
+    finally:
+        shutil.rmtree(directory)
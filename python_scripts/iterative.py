@@ -0,0 +1,235 @@
+from math import sqrt, hypot
+from operator import mul, add, sub
+from itertools import repeat
+
+from vector import Vector, numpy, imap
+
+
+class IterativeResult(object):
+
+    #x is the approximate solution, residual_history the residual norm
+    #||b - Ax|| after every iteration (the first entry is for the start point)
+    def __init__(self, x, converged, iterations, residual_history, method):
+        self.x = x
+        self.converged = converged
+        self.iterations = iterations
+        self.residual_history = residual_history
+        self.method = method
+
+    def residual(self):
+        return self.residual_history[-1]
+
+    def __str__(self):
+        return '{}: {} after {} iterations, residual {:.3e}'.format(
+            self.method, 'converged' if self.converged else 'not converged',
+            self.iterations, self.residual())
+
+
+METHODS = ('cg', 'bicgstab', 'gmres', 'jacobi', 'gauss_seidel')
+UNKNOWN_METHOD_MSG = 'Unknown iterative method'
+SYSTEM_MUST_BE_SQUARE_MSG = 'Iterative solvers need as many equations as variables'
+ZERO_DIAGONAL_MSG = 'Jacobi and Gauss-Seidel need a nonzero diagonal'
+WARM_START_WRONG_LENGTH_MSG = 'The warm start vector does not match the system'
+
+
+def dot(u, v):
+    return sum(imap(mul, u, v))
+
+
+def norm(u):
+    return sqrt(dot(u, u))
+
+
+def axpy(a, x, y):
+    #a*x + y
+    return list(imap(add, imap(mul, repeat(a), x), y))
+
+
+def matvec(system, x):
+    #Row by row CSR product; with numpy one gather and one segmented sum
+    indptr, indices, data = system.indptr, system.indices, system.data
+    if numpy is not None and len(data):
+        cols = numpy.frombuffer(indices, dtype='i{}'.format(indices.itemsize))
+        starts = numpy.frombuffer(indptr, dtype='i{}'.format(indptr.itemsize))
+        products = numpy.frombuffer(data, dtype=numpy.float64) * numpy.asarray(x, dtype=numpy.float64)[cols]
+        nonempty = starts[:-1] < starts[1:]
+        y = numpy.zeros(len(starts) - 1)
+        y[nonempty] = numpy.add.reduceat(products, starts[:-1][nonempty])
+        return y.tolist()
+    return [sum(data[k] * x[indices[k]] for k in range(indptr[i], indptr[i+1]))
+            for i in range(len(indptr) - 1)]
+
+
+def diagonal(system):
+    diag = [0.0] * len(system)
+    for i in range(len(system)):
+        for k in range(system.indptr[i], system.indptr[i+1]):
+            if system.indices[k] == i:
+                diag[i] = system.data[k]
+    if not all(diag):
+        raise Exception(ZERO_DIAGONAL_MSG)
+    return diag
+
+
+def cg(system, b, x, tol, maxiter):
+    #Conjugate gradient; only valid for symmetric positive-definite systems
+    r = list(imap(sub, b, matvec(system, x)))
+    p = list(r)
+    rr = dot(r, r)
+    history = [sqrt(rr)]
+    target = tol * norm(b)
+    for k in range(maxiter):
+        if history[-1] <= target:
+            return x, True, k, history
+        Ap = matvec(system, p)
+        alpha = rr / dot(p, Ap)
+        x = axpy(alpha, p, x)
+        r = axpy(-alpha, Ap, r)
+        rr_new = dot(r, r)
+        p = axpy(rr_new / rr, p, r)
+        rr = rr_new
+        history.append(sqrt(rr))
+    return x, history[-1] <= target, maxiter, history
+
+
+def bicgstab(system, b, x, tol, maxiter):
+    r = list(imap(sub, b, matvec(system, x)))
+    r_hat = list(r)
+    rho = alpha = omega = 1.0
+    v = p = [0.0] * len(b)
+    history = [norm(r)]
+    target = tol * norm(b)
+    for k in range(maxiter):
+        if history[-1] <= target:
+            return x, True, k, history
+        rho_new = dot(r_hat, r)
+        if rho_new == 0.0:
+            break
+        beta = (rho_new / rho) * (alpha / omega)
+        p = axpy(beta, axpy(-omega, v, p), r)
+        v = matvec(system, p)
+        alpha = rho_new / dot(r_hat, v)
+        s = axpy(-alpha, v, r)
+        t = matvec(system, s)
+        tt = dot(t, t)
+        omega = dot(t, s) / tt if tt else 0.0
+        x = axpy(omega, s, axpy(alpha, p, x))
+        r = axpy(-omega, t, s)
+        rho = rho_new
+        history.append(norm(r))
+        if omega == 0.0:
+            break
+    return x, history[-1] <= target, len(history) - 1, history
+
+
+def gmres(system, b, x, tol, maxiter, restart=30):
+    #Restarted GMRES(m): Arnoldi with modified Gram-Schmidt and Givens
+    #rotations keeping the least-squares residual up to date
+    target = tol * norm(b)
+    r = list(imap(sub, b, matvec(system, x)))
+    beta = norm(r)
+    history = [beta]
+    iterations = 0
+    while iterations < maxiter and beta > target:
+        m = min(restart, maxiter - iterations)
+        V = [[ri / beta for ri in r]]
+        H = []
+        cs, sn = [], []
+        g = [beta]
+        for j in range(m):
+            w = matvec(system, V[j])
+            h = []
+            for vi in V:
+                hij = dot(w, vi)
+                w = axpy(-hij, vi, w)
+                h.append(hij)
+            w_norm = norm(w)
+            h.append(w_norm)
+            for i in range(j):
+                h[i], h[i+1] = cs[i]*h[i] + sn[i]*h[i+1], -sn[i]*h[i] + cs[i]*h[i+1]
+            denom = hypot(h[j], h[j+1])
+            cs.append(h[j] / denom if denom else 1.0)
+            sn.append(h[j+1] / denom if denom else 0.0)
+            h[j] = denom
+            h[j+1] = 0.0
+            g.append(-sn[j] * g[j])
+            g[j] = cs[j] * g[j]
+            H.append(h)
+            iterations += 1
+            history.append(abs(g[j+1]))
+            if abs(g[j+1]) <= target or w_norm == 0.0:
+                break
+            V.append([wi / w_norm for wi in w])
+
+        k = len(H)
+        y = [0.0] * k
+        for i in range(k-1, -1, -1):
+            if H[i][i]:
+                y[i] = (g[i] - sum(H[l][i] * y[l] for l in range(i+1, k))) / H[i][i]
+        for i in range(k):
+            x = axpy(y[i], V[i], x)
+        r = list(imap(sub, b, matvec(system, x)))
+        beta = norm(r)
+        history[-1] = beta
+        if H[k-1][k-1] == 0.0:
+            break
+    return x, beta <= target, iterations, history
+
+
+def jacobi(system, b, x, tol, maxiter):
+    diag = diagonal(system)
+    target = tol * norm(b)
+    r = list(imap(sub, b, matvec(system, x)))
+    history = [norm(r)]
+    for k in range(maxiter):
+        if history[-1] <= target:
+            return x, True, k, history
+        x = [xi + ri / d for xi, ri, d in zip(x, r, diag)]
+        r = list(imap(sub, b, matvec(system, x)))
+        history.append(norm(r))
+    return x, history[-1] <= target, maxiter, history
+
+
+def gauss_seidel(system, b, x, tol, maxiter):
+    diag = diagonal(system)
+    indptr, indices, data = system.indptr, system.indices, system.data
+    target = tol * norm(b)
+    x = list(x)
+    history = [norm(list(imap(sub, b, matvec(system, x))))]
+    for k in range(maxiter):
+        if history[-1] <= target:
+            return x, True, k, history
+        for i in range(len(b)):
+            total = b[i]
+            for p in range(indptr[i], indptr[i+1]):
+                total -= data[p] * x[indices[p]]
+            x[i] += total / diag[i]
+        history.append(norm(list(imap(sub, b, matvec(system, x)))))
+    return x, history[-1] <= target, maxiter, history
+
+
+def solve(system, method='gmres', x0=None, tol=1e-10, maxiter=None, **options):
+    #system is anything CSR shaped (indptr/indices/data/rhs), e.g. SparseSystem.
+    #x0 warm starts from a previous solution (a Vector, a sequence or an
+    #earlier IterativeResult).
+    if method not in METHODS:
+        raise ValueError(UNKNOWN_METHOD_MSG)
+    n = len(system)
+    if n != system.dimension:
+        raise Exception(SYSTEM_MUST_BE_SQUARE_MSG)
+    if maxiter is None:
+        maxiter = 10 * n
+
+    b = list(system.rhs)
+    if isinstance(x0, IterativeResult):
+        x0 = x0.x
+    if x0 is None:
+        x = [0.0] * n
+    else:
+        x = [float(xi) for xi in x0]
+        if len(x) != n:
+            raise ValueError(WARM_START_WRONG_LENGTH_MSG)
+
+    solver = globals()[method]
+    x, converged, iterations, history = solver(system, b, x, tol, maxiter, **options)
+    return IterativeResult(Vector(x), converged, iterations, history, method)
@@ -0,0 +1,264 @@
+from math import sqrt
+
+from vector import Vector, numpy
+
+METHODS = ('qr', 'cholesky')
+UNKNOWN_METHOD_MSG = 'Unknown least-squares method'
+WEIGHTS_WRONG_LENGTH_MSG = 'There should be one weight per equation'
+NEGATIVE_WEIGHT_MSG = 'Weights can not be negative'
+RHS_WRONG_LENGTH_MSG = 'The right-hand side length does not match the system'
+
+#Columns whose remaining norm is below this times the largest column norm
+#are taken to be dependent on the ones already factored
+tolerance = 1e-10
+
+
+class LeastSquaresResult(object):
+
+    #x minimizes ||W^(1/2) (Ax - b)||; residual is that minimum and rank the
+    #numerical rank of A found on the way. For a rank-deficient A, x is the
+    #basic solution with the dependent variables set to zero.
+    def __init__(self, x, residual, rank, method):
+        self.x = x
+        self.residual = residual
+        self.rank = rank
+        self.method = method
+
+    def __str__(self):
+        return '{}: rank {}, residual {:.3e}, x = {}'.format(self.method, self.rank, self.residual,
+                                                            self.x.coordinates)
+
+
+def weighted(A, b, weights):
+    #Scale every equation by the square root of its weight
+    if weights is None:
+        return A, b
+    if len(weights) != len(b):
+        raise ValueError(WEIGHTS_WRONG_LENGTH_MSG)
+    if any(w < 0 for w in weights):
+        raise ValueError(NEGATIVE_WEIGHT_MSG)
+    roots = [sqrt(float(w)) for w in weights]
+    return [[s*x for x in r] for s, r in zip(roots, A)], [s*y for s, y in zip(roots, b)]
+
+
+def householder(A, b, tol=tolerance):
+    #Householder QR with column pivoting of the m x n rows A, applied to b
+    #on the way. Returns (R, c, permutation, rank): R (rank x n, as rows)
+    #and c = Q^T b, with column j of R being column permutation[j] of A.
+    m, n = len(A), len(A[0]) if len(A) else 0
+    if numpy is not None:
+        A = numpy.array(A, dtype=numpy.float64).reshape(m, n)
+        c = numpy.array(b, dtype=numpy.float64)
+    else:
+        A = [[float(x) for x in r] for r in A]
+        c = [float(y) for y in b]
+    permutation = list(range(n))
+    largest = None
+    rank = 0
+    for j in range(min(m, n)):
+        if numpy is not None:
+            norms = (A[j:, j:] ** 2).sum(axis=0)
+            p = j + int(numpy.argmax(norms))
+            size = sqrt(norms[p - j])
+        else:
+            norms = [sum(A[i][k] ** 2 for i in range(j, m)) for k in range(j, n)]
+            p = j + max(range(len(norms)), key=norms.__getitem__)
+            size = sqrt(norms[p - j])
+        if largest is None:
+            largest = size
+        if size <= tol * largest or size == 0:
+            break
+        if p != j:
+            permutation[j], permutation[p] = permutation[p], permutation[j]
+            if numpy is not None:
+                A[:, [j, p]] = A[:, [p, j]]
+            else:
+                for r in A:
+                    r[j], r[p] = r[p], r[j]
+
+        #Reflect column j onto alpha * e_j
+        if numpy is not None:
+            alpha = -size if A[j, j] >= 0 else size
+            v = A[j:, j].copy()
+            v[0] -= alpha
+            v /= numpy.sqrt(v.dot(v))
+            A[j:, j:] -= 2 * numpy.outer(v, v.dot(A[j:, j:]))
+            c[j:] -= 2 * v * v.dot(c[j:])
+            A[j+1:, j] = 0.0
+        else:
+            alpha = -size if A[j][j] >= 0 else size
+            v = [A[i][j] for i in range(j, m)]
+            v[0] -= alpha
+            length = sqrt(sum(x*x for x in v))
+            v = [x / length for x in v]
+            for k in range(j, n):
+                f = 2 * sum(v[i - j] * A[i][k] for i in range(j, m))
+                for i in range(j, m):
+                    A[i][k] -= f * v[i - j]
+            f = 2 * sum(v[i - j] * c[i] for i in range(j, m))
+            for i in range(j, m):
+                c[i] -= f * v[i - j]
+            for i in range(j+1, m):
+                A[i][j] = 0.0
+        rank += 1
+    return A[:rank], c, permutation, rank
+
+
+def back_substitute(R, c, rank):
+    z = [0.0] * rank
+    for i in range(rank - 1, -1, -1):
+        z[i] = (c[i] - sum(R[i][k] * z[k] for k in range(i + 1, rank))) / R[i][i]
+    return z
+
+
+def residual_norm(A, b, x):
+    return sqrt(sum((sum(a*y for a, y in zip(r, x)) - k) ** 2 for r, k in zip(A, b)))
+
+
+def solve_qr(A, b, tol=tolerance):
+    n = len(A[0]) if len(A) else 0
+    R, c, permutation, rank = householder(A, b, tol)
+    z = back_substitute(R, c, rank)
+    x = [0.0] * n
+    for j in range(rank):
+        x[permutation[j]] = z[j]
+    #Q^T (Ax - b) is [R z - c_1; -c_2], and R z = c_1
+    residual = sqrt(sum(float(y) ** 2 for y in c[rank:]))
+    return LeastSquaresResult(Vector(x), residual, rank, 'qr')
+
+
+def cholesky(G):
+    #Lower triangular L with G = L L^T, or None if G is not positive definite
+    n = len(G)
+    L = [[0.0] * n for i in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            s = G[i][j] - sum(L[i][k] * L[j][k] for k in range(j))
+            if i == j:
+                if s <= tolerance * max(abs(G[i][i]), 1):
+                    return None
+                L[i][i] = sqrt(s)
+            else:
+                L[i][j] = s / L[j][j]
+    return L
+
+
+def solve_cholesky(A, b, tol=tolerance):
+    #Normal equations A^T A x = A^T b: one n x n Cholesky instead of a QR of
+    #A, at the cost of squaring the condition number. Rank-deficient A has
+    #no Cholesky factor, so those fall back to QR.
+    n = len(A[0]) if len(A) else 0
+    if numpy is not None:
+        M = numpy.asarray(A, dtype=numpy.float64).reshape(len(A), n)
+        y = numpy.asarray(b, dtype=numpy.float64)
+        try:
+            L = numpy.linalg.cholesky(M.T.dot(M))
+        except numpy.linalg.LinAlgError:
+            return solve_qr(A, b, tol)
+        x = numpy.linalg.solve(L.T, numpy.linalg.solve(L, M.T.dot(y)))
+        return LeastSquaresResult(Vector(x), float(numpy.linalg.norm(M.dot(x) - y)), n, 'cholesky')
+
+    G = [[sum(r[i] * r[j] for r in A) for j in range(n)] for i in range(n)]
+    L = cholesky(G)
+    if L is None:
+        return solve_qr(A, b, tol)
+    g = [sum(r[i] * y for r, y in zip(A, b)) for i in range(n)]
+    w = [0.0] * n
+    for i in range(n):
+        w[i] = (g[i] - sum(L[i][k] * w[k] for k in range(i))) / L[i][i]
+    x = [0.0] * n
+    for i in range(n - 1, -1, -1):
+        x[i] = (w[i] - sum(L[k][i] * x[k] for k in range(i + 1, n))) / L[i][i]
+    return LeastSquaresResult(Vector(x), residual_norm(A, b, x), n, 'cholesky')
+
+
+def solve(A, b, weights=None, method='qr', tol=tolerance):
+    #Least-squares solution of the rows A (m x n) against b, optionally
+    #weighted per equation
+    if method not in METHODS:
+        raise ValueError(UNKNOWN_METHOD_MSG)
+    if len(b) != len(A):
+        raise ValueError(RHS_WRONG_LENGTH_MSG)
+    A, b = weighted([[float(x) for x in r] for r in A], [float(y) for y in b], weights)
+    if method == 'cholesky':
+        return solve_cholesky(A, b, tol)
+    return solve_qr(A, b, tol)
+
+
+def solve_batch(A, B, weights=None, tol=tolerance):
+    #Least squares for a stack of k small systems A[i] x = B[i] (A is
+    #k x m x n, B is k x m, weights k x m). With numpy every Householder
+    #step is applied to the whole stack at once; systems that turn out rank
+    #deficient are redone one by one with column pivoting.
+    #Returns (X, residuals, ranks).
+    if numpy is None or len(A) == 0:
+        results = [solve(a, b, weights[i] if weights is not None else None, tol=tol)
+                   for i, (a, b) in enumerate(zip(A, B))]
+        return ([r.x for r in results], [r.residual for r in results], [r.rank for r in results])
+
+    A0 = numpy.array(A, dtype=numpy.float64)
+    B0 = numpy.array(B, dtype=numpy.float64)
+    if B0.shape != A0.shape[:2]:
+        raise ValueError(RHS_WRONG_LENGTH_MSG)
+    if weights is not None:
+        W = numpy.asarray(weights, dtype=numpy.float64)
+        if W.shape != B0.shape:
+            raise ValueError(WEIGHTS_WRONG_LENGTH_MSG)
+        if (W < 0).any():
+            raise ValueError(NEGATIVE_WEIGHT_MSG)
+        roots = numpy.sqrt(W)
+        A0 = A0 * roots[:, :, None]
+        B0 = B0 * roots
+    k, m, n = A0.shape
+    if m < n:
+        results = [solve_qr(a.tolist(), b.tolist(), tol) for a, b in zip(A0, B0)]
+        return (numpy.array([r.x.coordinates for r in results]), numpy.array([r.residual for r in results]),
+                numpy.array([r.rank for r in results]))
+
+    R = A0.copy()
+    C = B0.copy()
+    for j in range(n):
+        v = R[:, j:, j].copy()
+        size = numpy.sqrt((v * v).sum(axis=1))
+        v[:, 0] += numpy.where(v[:, 0] >= 0, size, -size)
+        length = numpy.sqrt((v * v).sum(axis=1))
+        v /= numpy.where(length > 0, length, 1.0)[:, None]
+        R[:, j:, j:] -= 2 * v[:, :, None] * numpy.einsum('km,kmn->kn', v, R[:, j:, j:])[:, None, :]
+        C[:, j:] -= 2 * v * numpy.einsum('km,km->k', v, C[:, j:])[:, None]
+
+    diagonal = numpy.abs(numpy.diagonal(R[:, :n, :n], axis1=1, axis2=2))
+    scale = numpy.sqrt((A0 * A0).sum(axis=1)).max(axis=1)
+    full = (diagonal > tol * numpy.maximum(scale, 1e-300)[:, None]).all(axis=1)
+
+    X = numpy.zeros((k, n))
+    safe = numpy.where(full[:, None], numpy.diagonal(R[:, :n, :n], axis1=1, axis2=2), 1.0)
+    for i in range(n - 1, -1, -1):
+        X[:, i] = (C[:, i] - (R[:, i, i+1:n] * X[:, i+1:]).sum(axis=1)) / safe[:, i]
+    residuals = numpy.sqrt((C[:, n:] ** 2).sum(axis=1))
+    ranks = numpy.full(k, n)
+
+    for i in numpy.nonzero(~full)[0]:
+        result = solve_qr(A0[i].tolist(), B0[i].tolist(), tol)
+        X[i] = result.x.coordinates
+        residuals[i] = result.residual
+        ranks[i] = result.rank
+    return X, residuals, ranks
+
+
+def batchTest():
+    print("******\nLEAST SQUARES BATCH")
+    #Full rank, rank deficient (equal columns) and, separately, a stack of
+    #underdetermined systems: every result is what solve_qr gives alone
+    tall = [[[1, 0], [0, 1], [1, 1]], [[1, 1], [2, 2], [3, 3]], [[2, 1], [1, 3], [0, 1]]]
+    tall_rhs = [[1, 2, 3], [1, 2, 4], [3, 1, 2]]
+    wide = [[[1, 2, 3], [0, 1, 1]], [[1, 1, 1], [2, 2, 2]]]
+    wide_rhs = [[1, 2], [1, 2]]
+    for case, (A, B) in enumerate(((tall, tall_rhs), (wide, wide_rhs))):
+        X, residuals, ranks = solve_batch(A, B)
+        for i, (a, b) in enumerate(zip(A, B)):
+            single = solve_qr(a, b)
+            if not (int(ranks[i]) == single.rank and abs(residuals[i] - single.residual) < 1e-9 and
+                    all(abs(x - y) < 1e-9 for x, y in zip(X[i], single.x))):
+                print('test case {} failed'.format(2*case + 1))
+        if [int(r) for r in ranks] != ([2, 1, 2] if case == 0 else [2, 1]):
+            print('test case {} failed'.format(2*case + 2))
@@ -1,19 +1,31 @@
-from decimal import Decimal, getcontext
-from copy import deepcopy
+import sys
 
 from vector import Vector
+import hyperplane
+from hyperplane import Hyperplane
 from plane import Plane
+from augmented import AugmentedMatrix
+from solution import Solution
 
-getcontext().prec = 30
+#The sparse, LU, least-squares and incremental solvers are imported by the
+#methods that use them, so importing linsys stays cheap
 
 
 class LinearSystem(object):
 
     ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG = 'All planes in the system should live in the same dimension'
-    NO_SOLUTIONS_MSG = 'No solutions'
-    INF_SOLUTIONS_MSG = 'Infinitely many solutions'
-
-    def __init__(self, planes):
+    NO_SOLUTIONS_MSG = Solution.NO_SOLUTIONS_MSG
+    INF_SOLUTIONS_MSG = Solution.INF_SOLUTIONS_MSG
+
+    def __init__(self, planes, numeric='float', precision=30, tracer=None):
+        #planes may be Lines, Planes or Hyperplanes of any one dimension.
+        #numeric selects the arithmetic of the matrix solvers: 'float',
+        #'decimal' (at the given precision) or 'fraction' (exact). tracer, a
+        #tracing.Tracer, is told about every row operation and pivot.
+        self.numeric = numeric
+        self.precision = precision
+        self.tracer = tracer
+        self.echelon = None
         try:
             d = planes[0].dimension
             for p in planes:
@@ -26,17 +38,89 @@ class LinearSystem(object):
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
 
 
+    @classmethod
+    def from_matrix(cls, matrix):
+        return cls(matrix.to_planes(), matrix.numeric, matrix.precision, matrix.tracer)
+
+    def to_matrix(self):
+        #Pack the planes into one augmented matrix for the in place solver
+        return AugmentedMatrix.from_planes(self.planes, self.numeric, self.precision, self.tracer)
+
+    def to_sparse(self):
+        from sparse import SparseSystem
+        return SparseSystem.from_planes(self.planes)
+
+    def solve(self, cache=None):
+        #One pivoted RREF pass classifies the system and parametrizes it;
+        #with a solvecache.SolveCache a repeated system is looked up instead
+        if cache is not None:
+            return cache.solve(self)
+        return self.to_matrix().compute_rref().solution()
+
+    def solve_iterative(self, method='gmres', x0=None, tol=1e-10, maxiter=None, **options):
+        #Approximate solution by cg, bicgstab, gmres, jacobi or gauss_seidel
+        return self.to_sparse().solve_iterative(method, x0, tol, maxiter, **options)
+
+    def factorization(self):
+        #Rank-revealing LU of [A | b], shared by rank(), determinant(),
+        #inverse(), null_space() and condition_estimate() until a row changes
+        if self.echelon is None:
+            import lu
+            self.echelon = lu.EchelonLU([p.normal_vector.coordinates for p in self.planes],
+                                        [p.constant_term for p in self.planes])
+        return self.echelon
+
+    def rank(self, augmented=False):
+        #augmented=True gives the rank of [A | b]; it is larger than the rank
+        #of A exactly when there is no solution
+        f = self.factorization()
+        return f.augmented_rank if augmented else f.rank
+
+    def determinant(self):
+        return self.factorization().determinant()
+
+    def inverse(self):
+        return self.factorization().inverse()
+
+    def null_space(self):
+        return self.factorization().null_space()
+
+    def condition_estimate(self):
+        return self.factorization().condition_estimate()
+
+    def lstsq(self, weights=None, method='qr'):
+        #Least-squares fit for overdetermined (or inconsistent) systems by
+        #pivoted Householder QR or, with method='cholesky', the normal
+        #equations; weights scale each equation's squared residual
+        import leastsq
+        return leastsq.solve([p.normal_vector.coordinates for p in self.planes],
+                             [p.constant_term for p in self.planes], weights, method)
+
+    def factorize(self, use_cache=True):
+        #Reusable LU of the coefficient matrix; solve(b) per right-hand side
+        import lu
+        return lu.factorize([p.normal_vector.coordinates for p in self.planes], use_cache)
+
+    def incremental(self):
+        #Solver state that follows equations being added, removed or changed
+        from incremental import IncrementalSystem
+        return IncrementalSystem(list(self.planes), self.dimension)
+
     def swap_rows(self, row1, row2):
         """
         temp = self[row1]
         self[row1] = self[row2]
         self[row2] = temp
         """
+        if self.tracer is not None:
+            self.tracer.rows_swapped(row1, row2)
         self[row1], self[row2] = self[row2], self[row1]
 
 
     def multiply_coefficient_and_row(self, coefficient, row):
         #self[row] = Plane(self[row].normal_vector.scalar(coefficient), self[row].constant_term * coefficient)
+        if self.tracer is not None:
+            self.tracer.row_scaled(coefficient, row)
 
         v = self[row].normal_vector
         k = self[row].constant_term
@@ -44,9 +128,12 @@ class LinearSystem(object):
         new_v = v.scalar(coefficient)
         new_k = k * coefficient
 
-        self[row] = Plane(Vector(new_v), new_k)
+        self[row] = type(self[row])(Vector(new_v), new_k)
 
     def add_multiple_times_row_to_row(self, coefficient, row_to_add, row_to_be_added_to):
+        if self.tracer is not None:
+            self.tracer.row_added(coefficient, row_to_add, row_to_be_added_to)
+
         #Define variable for the vector and constant term
         v = self[row_to_add].normal_vector
         k = self[row_to_add].constant_term
@@ -59,69 +146,22 @@ class LinearSystem(object):
         v_new = v_multi.add(self[row_to_be_added_to].normal_vector)
         k_new = k_multi + self[row_to_be_added_to].constant_term
 
-        self[row_to_be_added_to] = Plane(Vector(v_new), k_new)     
+        self[row_to_be_added_to] = type(self[row_to_be_added_to])(Vector(v_new), k_new)     
+
+    def copy(self):
+        #Row operations replace Plane objects instead of changing them, so a
+        #new list of the same planes is an independent system
+        return LinearSystem(list(self.planes), self.numeric, self.precision, self.tracer)
 
     def compute_triangular_form(self):
-        system = deepcopy(self)
-
-        print "\n******************************\nTRIANGULAR FORM\n"
-            
-        #Row (reduce row)
-        for row in range(len(system)-1):
-            print system
-
-            #Make sure we find our pivot row by having a leading non-zero coefficient
-            if system[row].normal_vector[row] == 0:
-                #Find the first leading non-zero term
-                for rowLeadingNonZero in range(row+1,len(system)-1):
-                    if system[rowLeadingNonZero] != 0 :
-                        #Swap leading non-zero row with current row
-                        system.swap_rows(row,rowLeadingNonZero)
-
-            #Define Pivot Row and leading coefficient
-            pivotRow = system[row]
-            leadingCoefficient = pivotRow.normal_vector[row]
-
-            #Multiple all following rows by alpha            
-            for rowToBeMultipled in range(row+1,len(system)):
-                #Alpha = leading coefficient of row to be swapped / leading coefficient of pivot
-                alpha = float(-(system[rowToBeMultipled].normal_vector[row]/leadingCoefficient))
-                system.add_multiple_times_row_to_row(alpha,row,rowToBeMultipled)
-            
-            print " **Iteration**"
-        return system
+        #Eliminated in this system's numeric mode, taking the first nonzero
+        #entry of each column as its pivot as the row operations above would
+        matrix = self.to_matrix()
+        matrix.pivoting = 'first'
+        return LinearSystem.from_matrix(matrix.compute_triangular_form())
 
     def compute_rref(self):
-
-        tf = self.compute_triangular_form()
-
-        print "\n******************************\nRREF\n"
-        print tf
-        #Find values of variables
-        for row in range(len(tf)-1,-1,-1):
-
-            #Special case: if row was zeroed out during triangular computation, skip
-            if not sum(tf[row].normal_vector) == 0 :
-                for x in range(len(tf[row].normal_vector)):
-                    col = tf[row].normal_vector[x]
-
-                    ##Find leading coefficient of pivot row
-                    if col != 0:
-                        leadingCoefficient = col
-                        break
-
-                #Scale pivot row to leading coefficent of 1
-                alpha_k = float(1/leadingCoefficient)
-                print alpha_k
-                tf.multiply_coefficient_and_row(alpha_k,row)
-
-                #Clear variables up
-                for rowUp in range(row,0,-1):
-                    alpha = float(-tf[rowUp-1].normal_vector[x])
-                    tf.add_multiple_times_row_to_row(alpha,row,rowUp-1)
-        print tf
-
-        return tf       
+        return LinearSystem.from_matrix(self.to_matrix().compute_rref())
 
 
     def indices_of_first_nonzero_terms_in_each_row(self):
@@ -134,7 +174,7 @@ class LinearSystem(object):
             try:
                 indices[i] = p.first_nonzero_index(p.normal_vector)
             except Exception as e:
-                if str(e) == Plane.NO_NONZERO_ELTS_FOUND_MSG:
+                if str(e) == Hyperplane.NO_NONZERO_ELTS_FOUND_MSG:
                     continue
                 else:
                     raise e
@@ -154,6 +194,7 @@ class LinearSystem(object):
         try:
             assert x.dimension == self.dimension
             self.planes[i] = x
+            self.echelon = None
 
         except AssertionError:
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
@@ -166,29 +207,34 @@ class LinearSystem(object):
         return ret
 
 
-class MyDecimal(Decimal):
-    def is_near_zero(self, eps=1e-10):
-        return abs(self) < eps
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        #hyperplane.MyDecimal, made on first use
+        if name == 'MyDecimal':
+            return hyperplane.MyDecimal
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+else:
+    MyDecimal = hyperplane.MyDecimal
 
 
 def triangularFormTest():
-    print "******\nTRIANGULAR FORM OPERATIONS"
+    print("******\nTRIANGULAR FORM OPERATIONS")
     
     p1 = Plane(normal_vector=Vector([1,1,1]), constant_term=1)
     p2 = Plane(normal_vector=Vector([0,1,1]), constant_term=2)
     s = LinearSystem([p1,p2])
     t = s.compute_triangular_form()
     if not (t[0] == p1 and t[1] == p2):
-        print 'test case 1 failed'
+        print('test case 1 failed')
 
     p1 = Plane(normal_vector=Vector([1,1,1]), constant_term=1)
     p2 = Plane(normal_vector=Vector([1,1,1]), constant_term=2)
     s = LinearSystem([p1,p2])
-    print s
+    print(s)
     t = s.compute_triangular_form()
     if not (t[0] == p1 and
             t[1] == Plane(constant_term=1)):
-        print 'test case 2 failed'
+        print('test case 2 failed')
     
     p1 = Plane(normal_vector=Vector([1,1,1]), constant_term=1)
     p2 = Plane(normal_vector=Vector([0,1,0]), constant_term=2)
@@ -200,7 +246,7 @@ def triangularFormTest():
             t[1] == p2 and
             t[2] == Plane(normal_vector=Vector([0,0,-2]), constant_term=2) and
             t[3] == Plane()):
-        print 'test case 3 failed'
+        print('test case 3 failed')
     
     p1 = Plane(normal_vector=Vector([0,1,1]), constant_term=1)
     p2 = Plane(normal_vector=Vector([1,-1,1]), constant_term=2)
@@ -210,10 +256,10 @@ def triangularFormTest():
     if not (t[0] == Plane(normal_vector=Vector([1,-1,1]), constant_term=2) and
             t[1] == Plane(normal_vector=Vector([0,1,1]), constant_term=1) and
             t[2] == Plane(normal_vector=Vector([0,0,-9]), constant_term=-2)):
-        print 'test case 4 failed'
+        print('test case 4 failed')
 
 def rowOpsTest():
-    print "******\nROW OPERATIONS"
+    print("******\nROW OPERATIONS")
 
     p0 = Plane(normal_vector=Vector([1,1,1]), constant_term=1)
     p1 = Plane(normal_vector=Vector([0,1,0]), constant_term=2)
@@ -223,83 +269,84 @@ def rowOpsTest():
 
     #print s.indices_of_first_nonzero_terms_in_each_row()
     #print '{},{},{},{}'.format(s[0],s[1],s[2],s[3])
-    print s
+    print(s)
 
     s.swap_rows(0,1)
     if not (s[0] == p1 and s[1] == p0 and s[2] == p2 and s[3] == p3):
-        print 'test case 1 failed'
+        print('test case 1 failed')
 
     s.swap_rows(1,3)
     if not (s[0] == p1 and s[1] == p3 and s[2] == p2 and s[3] == p0):
-        print 'test case 2 failed'
+        print('test case 2 failed')
 
     s.swap_rows(3,1)
     if not (s[0] == p1 and s[1] == p0 and s[2] == p2 and s[3] == p3):
-        print 'test case 3 failed'
+        print('test case 3 failed')
 
     s.multiply_coefficient_and_row(1,1)
     if not (s[0] == (p1) and s[1] == p0 and s[2] == p2 and s[3] == p3):
-        print s[0]
-        print p1
-        print 'test case 4 failed'
+        print(s[0])
+        print(p1)
+        print('test case 4 failed')
 
     s.multiply_coefficient_and_row(-1,2)
     if not (s[0] == p1 and
             s[1] == p0 and
             s[2] == Plane(normal_vector=Vector([-1,-1,1]), constant_term=-3) and
             s[3] == p3):
-        print 'test case 5 failed'
+        print('test case 5 failed')
     
     s.multiply_coefficient_and_row(10,1)
     if not (s[0] == p1 and
             s[1] == Plane(normal_vector=Vector([10,10,10]), constant_term=10) and
             s[2] == Plane(normal_vector=Vector([-1,-1,1]), constant_term=-3) and
             s[3] == p3):
-        print 'test case 6 failed'
+        print('test case 6 failed')
 
     s.add_multiple_times_row_to_row(0,0,1)
     if not (s[0] == p1 and
             s[1] == Plane(normal_vector=Vector([10,10,10]), constant_term=10) and
             s[2] == Plane(normal_vector=Vector([-1,-1,1]), constant_term=-3) and
             s[3] == p3):
-        print 'test case 7 failed'
+        print('test case 7 failed')
 
     s.add_multiple_times_row_to_row(1,0,1)
     if not (s[0] == p1 and
             s[1] == Plane(normal_vector=Vector([10,11,10]), constant_term=12) and
             s[2] == Plane(normal_vector=Vector([-1,-1,1]), constant_term=-3) and
             s[3] == p3):
-        print 'test case 8 failed'
+        print('test case 8 failed')
 
     s.add_multiple_times_row_to_row(-1,1,0)
     if not (s[0] == Plane(normal_vector=Vector([-10,-10,-10]), constant_term=-10) and
             s[1] == Plane(normal_vector=Vector([10,11,10]), constant_term=12) and
             s[2] == Plane(normal_vector=Vector([-1,-1,1]), constant_term=-3) and
             s[3] == p3):
-        print 'test case 9 failed'
+        print('test case 9 failed')
 
-    print s
+    print(s)
 
 def rrefTest():
-    print "******************\n   TEST CASE 1\n******************"
+    print("******************\n   TEST CASE 1\n******************")
+    from decimal import Decimal
     p1 = Plane(normal_vector=Vector([1,1,1]), constant_term=1)
     p2 = Plane(normal_vector=Vector([0,1,1]), constant_term=2)
     s = LinearSystem([p1,p2])
     r = s.compute_rref()
     if not (r[0] == Plane(normal_vector=Vector([1,0,0]), constant_term=-1) and
             r[1] == p2):
-        print 'test case 1 failed'
+        print('test case 1 failed')
 
-    print "******************\n   TEST CASE 2\n******************"
+    print("******************\n   TEST CASE 2\n******************")
     p1 = Plane(normal_vector=Vector([1,1,1]), constant_term=1)
     p2 = Plane(normal_vector=Vector([1,1,1]), constant_term=2)
     s = LinearSystem([p1,p2])
     r = s.compute_rref()
     if not (r[0] == p1 and
             r[1] == Plane(constant_term=1)):
-        print 'test case 2 failed'
+        print('test case 2 failed')
     
-    print "******************\n   TEST CASE 3\n******************"
+    print("******************\n   TEST CASE 3\n******************")
     p1 = Plane(normal_vector=Vector([1,1,1]), constant_term=1)
     p2 = Plane(normal_vector=Vector([0,1,0]), constant_term=2)
     p3 = Plane(normal_vector=Vector([1,1,-1]), constant_term=3)
@@ -310,9 +357,9 @@ def rrefTest():
             r[1] == p2 and
             r[2] == Plane(normal_vector=Vector([0,0,-2]), constant_term=2) and
             r[3] == Plane()):
-        print 'test case 3 failed'
+        print('test case 3 failed')
 
-    print "******************\n   TEST CASE 4\n******************"
+    print("******************\n   TEST CASE 4\n******************")
     p1 = Plane(normal_vector=Vector([0,1,1]), constant_term=1)
     p2 = Plane(normal_vector=Vector([1,-1,1]), constant_term=2)
     p3 = Plane(normal_vector=Vector([1,2,-5]), constant_term=3)
@@ -321,23 +368,32 @@ def rrefTest():
     if not (r[0] == Plane(normal_vector=Vector([1,0,0]), constant_term=Decimal(23)/Decimal(9)) and
             r[1] == Plane(normal_vector=Vector([0,1,0]), constant_term=Decimal(7)/Decimal(9)) and
             r[2] == Plane(normal_vector=Vector([0,0,1]), constant_term=Decimal(2)/Decimal(9))):
-        print 'test case 4 failed'
+        print('test case 4 failed')
+
+    print("******************\n   TEST CASE 5\n******************")
+    #The same system in fraction mode: exact thirds and ninths, not floats
+    from fractions import Fraction
+    r = LinearSystem([p1,p2,p3], numeric='fraction').compute_rref()
+    if not ([list(p.normal_vector) + [p.constant_term] for p in r] ==
+            [[1, 0, 0, Fraction(23, 9)], [0, 1, 0, Fraction(7, 9)], [0, 0, 1, Fraction(2, 9)]] and
+            all(isinstance(x, Fraction) for p in r for x in list(p.normal_vector) + [p.constant_term])):
+        print('test case 5 failed')
 
 def gaussianTest():
-    print "******************\n   TEST CASE 1\n******************"
+    print("******************\n   TEST CASE 1\n******************")
     p1 = Plane(Vector([5.862,1.178,-10.366]),-8.15)
     p2 = Plane(Vector([-2.931,-.589,5.183]),-4.075)
     s = LinearSystem([p1,p2])
     t = s.compute_rref()
 
-    print "******************\n   TEST CASE 2\n******************"
+    print("******************\n   TEST CASE 2\n******************")
     p1 = Plane(Vector([8.631,5.112,-1.816]),-5.113)
     p2 = Plane(Vector([4.315,11.132,-5.27]),-6.775)
     p3 = Plane(Vector([-2.158,3.01,-1.727]),-.831)
     s = LinearSystem([p1,p2,p3])
     t = s.compute_rref()
 
-    print "******************\n   TEST CASE 3\n******************"
+    print("******************\n   TEST CASE 3\n******************")
     p1 = Plane(Vector([5.262,2.739,-9.878]),-3.441)
     p2 = Plane(Vector([5.111,6.358,7.638]),-2.152)
     p3 = Plane(Vector([2.016,-9.924,-1.367]),-9.278)
@@ -345,7 +401,5 @@ def gaussianTest():
     s = LinearSystem([p1,p2,p3,p4])
     t = s.compute_rref()
 
-#rowOpsTest()
-#triangularFormTest()
-#rrefTest()
-gaussianTest()
\ No newline at end of file
+if __name__ == '__main__':
+    gaussianTest()
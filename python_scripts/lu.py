@@ -0,0 +1,326 @@
+from collections import OrderedDict
+
+from vector import Vector, numpy, is_ndarray
+from vectorarray import VectorArray
+import blocked
+
+
+class LUFactorization(object):
+
+    MATRIX_MUST_BE_SQUARE_MSG = 'LU factorization needs a square coefficient matrix'
+    SINGULAR_MATRIX_MSG = 'The coefficient matrix is singular'
+    RHS_WRONG_LENGTH_MSG = 'The right-hand side length does not match the system'
+
+    zero_tolerance = 1e-10
+    block_size = blocked.block_size
+
+    #PA = LU with partial pivoting. L (unit diagonal) and U share one n x n
+    #buffer and permutation[i] is the original row that ended up in row i, so
+    #every later solve is a permuted forward and back substitution in O(n^2).
+    def __init__(self, coefficients, block_size=None):
+        if numpy is not None:
+            LU = numpy.array(coefficients, dtype=numpy.float64)
+            if LU.ndim != 2 or LU.shape[0] != LU.shape[1]:
+                raise ValueError(self.MATRIX_MUST_BE_SQUARE_MSG)
+        else:
+            LU = [[float(x) for x in r] for r in coefficients]
+            for r in LU:
+                if len(r) != len(LU):
+                    raise ValueError(self.MATRIX_MUST_BE_SQUARE_MSG)
+
+        n = len(LU)
+        block_size = block_size or self.block_size
+        if numpy is not None and n > block_size:
+            pivots, permutation = blocked.eliminate(LU, n, block_size, self.zero_tolerance,
+                                                    keep_multipliers=True)
+            if len(pivots) < n:
+                raise Exception(self.SINGULAR_MATRIX_MSG)
+            self.LU = LU
+            self.permutation = permutation.tolist()
+            self.dimension = n
+            return
+
+        permutation = list(range(n))
+        for k in range(n):
+            if numpy is not None:
+                p = k + int(numpy.argmax(numpy.abs(LU[k:, k])))
+            else:
+                p = max(range(k, n), key=lambda r: abs(LU[r][k]))
+            if abs(LU[p][k]) < self.zero_tolerance:
+                raise Exception(self.SINGULAR_MATRIX_MSG)
+            if p != k:
+                if numpy is not None:
+                    LU[[k, p]] = LU[[p, k]]
+                else:
+                    LU[k], LU[p] = LU[p], LU[k]
+                permutation[k], permutation[p] = permutation[p], permutation[k]
+
+            if numpy is not None:
+                LU[k+1:, k] /= LU[k, k]
+                LU[k+1:, k+1:] -= numpy.outer(LU[k+1:, k], LU[k, k+1:])
+            else:
+                pivot = LU[k]
+                for r in range(k+1, n):
+                    row = LU[r]
+                    alpha = row[k] / pivot[k]
+                    row[k] = alpha
+                    if alpha:
+                        for j in range(k+1, n):
+                            row[j] -= alpha * pivot[j]
+
+        self.LU = LU
+        self.permutation = permutation
+        self.dimension = n
+
+    def determinant(self):
+        #Sign of the permutation times the product of U's diagonal
+        det = 1.0
+        seen = [False] * self.dimension
+        for i in range(self.dimension):
+            det *= self.LU[i][i]
+            if not seen[i]:
+                j, cycle = i, 0
+                while not seen[j]:
+                    seen[j] = True
+                    j = self.permutation[j]
+                    cycle += 1
+                if cycle % 2 == 0:
+                    det = -det
+        return float(det)
+
+    def solve(self, b):
+        if len(b) != self.dimension:
+            raise ValueError(self.RHS_WRONG_LENGTH_MSG)
+        n = self.dimension
+        LU = self.LU
+        if numpy is not None:
+            b = numpy.asarray(b.coordinates if isinstance(b, Vector) else b, dtype=numpy.float64)
+            x = b[self.permutation]
+            for i in range(1, n):
+                x[i] -= LU[i, :i].dot(x[:i])
+            for i in range(n-1, -1, -1):
+                x[i] = (x[i] - LU[i, i+1:].dot(x[i+1:])) / LU[i, i]
+            return Vector(x)
+
+        x = [float(b[p]) for p in self.permutation]
+        for i in range(1, n):
+            row = LU[i]
+            x[i] -= sum(row[j]*x[j] for j in range(i))
+        for i in range(n-1, -1, -1):
+            row = LU[i]
+            x[i] = (x[i] - sum(row[j]*x[j] for j in range(i+1, n))) / row[i]
+        return Vector(x)
+
+    def solve_many(self, B):
+        #B holds one right-hand side per row; solution i is row i of the result
+        if numpy is None:
+            return VectorArray([self.solve(b) for b in B])
+
+        if isinstance(B, VectorArray):
+            B = B.to_numpy()
+        B = numpy.array(B, dtype=numpy.float64)
+        if B.ndim != 2 or B.shape[1] != self.dimension:
+            raise ValueError(self.RHS_WRONG_LENGTH_MSG)
+        LU = self.LU
+        X = B.T[self.permutation]
+        for i in range(1, self.dimension):
+            X[i] -= LU[i, :i].dot(X[:i])
+        for i in range(self.dimension-1, -1, -1):
+            X[i] = (X[i] - LU[i, i+1:].dot(X[i+1:])) / LU[i, i]
+        return VectorArray(X.T)
+
+
+class EchelonLU(object):
+
+    MATRIX_MUST_BE_SQUARE_MSG = LUFactorization.MATRIX_MUST_BE_SQUARE_MSG
+    SINGULAR_MATRIX_MSG = LUFactorization.SINGULAR_MATRIX_MSG
+    RHS_WRONG_LENGTH_MSG = LUFactorization.RHS_WRONG_LENGTH_MSG
+
+    zero_tolerance = 1e-10
+
+    #PA = LU for any m x n A, and so rank revealing: columns without a usable
+    #pivot are skipped, leaving U in row echelon form with pivot k in column
+    #pivot_columns[k]. L and U share one buffer as in LUFactorization.
+    #
+    #An optional right-hand side is eliminated along as column n, which
+    #gives the rank of [A | b] from the same pass.
+    def __init__(self, coefficients, rhs=None):
+        rows = [list(r) + ([rhs[i]] if rhs is not None else []) for i, r in enumerate(coefficients)]
+        if numpy is not None:
+            LU = numpy.array(rows, dtype=numpy.float64).reshape(len(rows), -1)
+        else:
+            LU = [[float(x) for x in r] for r in rows]
+        m = len(LU)
+        width = len(LU[0]) if m else 0
+        self.dimension = width - (rhs is not None)
+        #1-norm of A, for condition_estimate
+        self.norm = max([sum(abs(LU[i][j]) for i in range(m)) for j in range(self.dimension)] or [0.0])
+
+        permutation = list(range(m))
+        pivots = []
+        sign = 1
+        row = 0
+        for col in range(width):
+            if row >= m:
+                break
+            if numpy is not None:
+                p = row + int(numpy.argmax(numpy.abs(LU[row:, col])))
+            else:
+                p = max(range(row, m), key=lambda r: abs(LU[r][col]))
+            if abs(LU[p][col]) < self.zero_tolerance:
+                continue
+            if p != row:
+                if numpy is not None:
+                    LU[[row, p]] = LU[[p, row]]
+                else:
+                    LU[row], LU[p] = LU[p], LU[row]
+                permutation[row], permutation[p] = permutation[p], permutation[row]
+                sign = -sign
+
+            if numpy is not None:
+                LU[row+1:, col] /= LU[row, col]
+                LU[row+1:, col+1:] -= numpy.outer(LU[row+1:, col], LU[row, col+1:])
+            else:
+                pivot = LU[row]
+                for r in range(row+1, m):
+                    target = LU[r]
+                    alpha = target[col] / pivot[col]
+                    target[col] = alpha
+                    if alpha:
+                        for j in range(col+1, width):
+                            target[j] -= alpha * pivot[j]
+            pivots.append(col)
+            row += 1
+
+        self.LU = LU
+        self.permutation = permutation
+        self.sign = sign
+        self.augmented_rank = len(pivots)
+        self.pivot_columns = [c for c in pivots if c < self.dimension]
+        self.rank = len(self.pivot_columns)
+        self.equations = m
+
+    def is_square(self):
+        return self.equations == self.dimension
+
+    def is_singular(self):
+        return not self.is_square() or self.rank < self.dimension
+
+    def determinant(self):
+        if not self.is_square():
+            raise ValueError(self.MATRIX_MUST_BE_SQUARE_MSG)
+        if self.is_singular():
+            return 0.0
+        det = float(self.sign)
+        for i in range(self.dimension):
+            det *= self.LU[i][i]
+        return float(det)
+
+    def check_invertible(self):
+        if not self.is_square():
+            raise ValueError(self.MATRIX_MUST_BE_SQUARE_MSG)
+        if self.is_singular():
+            raise Exception(self.SINGULAR_MATRIX_MSG)
+
+    def solve(self, b):
+        #x with Ax = b, for square nonsingular A
+        self.check_invertible()
+        if len(b) != self.dimension:
+            raise ValueError(self.RHS_WRONG_LENGTH_MSG)
+        n, LU = self.dimension, self.LU
+        x = [float(b[p]) for p in self.permutation]
+        for i in range(1, n):
+            x[i] -= sum(LU[i][j] * x[j] for j in range(i))
+        for i in range(n-1, -1, -1):
+            x[i] = (x[i] - sum(LU[i][j] * x[j] for j in range(i+1, n))) / LU[i][i]
+        return x
+
+    def solve_transpose(self, c):
+        #y with A^T y = c: U^T z = c, L^T w = z, y = P^T w
+        self.check_invertible()
+        n, LU = self.dimension, self.LU
+        z = [float(v) for v in c]
+        for i in range(n):
+            z[i] = (z[i] - sum(LU[j][i] * z[j] for j in range(i))) / LU[i][i]
+        for i in range(n-1, -1, -1):
+            z[i] -= sum(LU[j][i] * z[j] for j in range(i+1, n))
+        y = [0.0] * n
+        for i, p in enumerate(self.permutation):
+            y[p] = z[i]
+        return y
+
+    def inverse(self):
+        #Rows of A^-1, one solve per column of the identity
+        self.check_invertible()
+        n = self.dimension
+        columns = [self.solve([1.0 if i == j else 0.0 for i in range(n)]) for j in range(n)]
+        return VectorArray([[columns[j][i] for j in range(n)] for i in range(n)])
+
+    def null_space(self):
+        #Basis of {x : Ax = 0}: one vector per free column, found by back
+        #substitution through the pivot rows of U
+        n, LU = self.dimension, self.LU
+        pivots = self.pivot_columns
+        basis = []
+        for free in range(n):
+            if free in pivots:
+                continue
+            x = [0.0] * n
+            x[free] = 1.0
+            for k in range(len(pivots) - 1, -1, -1):
+                col = pivots[k]
+                x[col] = -sum(LU[k][j] * x[j] for j in range(col+1, n)) / LU[k][col]
+            basis.append(Vector(x))
+        return basis
+
+    def condition_estimate(self):
+        #1-norm condition number ||A|| ||A^-1||, with ||A^-1|| estimated by
+        #Hager's method from a few solves instead of forming the inverse;
+        #infinite for singular (or non-square) A
+        if self.is_singular():
+            return float('inf')
+        n = self.dimension
+        x = [1.0 / n] * n
+        estimate = 0.0
+        for iteration in range(5):
+            y = self.solve(x)
+            size = sum(abs(v) for v in y)
+            if iteration and size <= estimate:
+                break
+            estimate = size
+            z = self.solve_transpose([1.0 if v >= 0 else -1.0 for v in y])
+            j = max(range(n), key=lambda i: abs(z[i]))
+            if iteration and abs(z[j]) <= sum(a*b for a, b in zip(z, x)):
+                break
+            x = [0.0] * n
+            x[j] = 1.0
+        return self.norm * estimate
+
+
+#Factorizations of recently seen coefficient matrices, most recent last
+cache_size = 64
+factor_cache = OrderedDict()
+
+
+def coefficient_key(coefficients):
+    if is_ndarray(coefficients):
+        return (coefficients.shape, numpy.ascontiguousarray(coefficients, dtype=numpy.float64).tobytes())
+    return tuple(tuple(float(x) for x in r) for r in coefficients)
+
+
+def factorize(coefficients, use_cache=True):
+    if not use_cache:
+        return LUFactorization(coefficients)
+
+    key = coefficient_key(coefficients)
+    lu = factor_cache.pop(key, None)
+    if lu is None:
+        lu = LUFactorization(coefficients)
+    factor_cache[key] = lu
+    while len(factor_cache) > cache_size:
+        factor_cache.popitem(last=False)
+    return lu
+
+
+def clear_cache():
+    factor_cache.clear()
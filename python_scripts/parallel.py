@@ -0,0 +1,91 @@
+from multiprocessing import Pool, cpu_count
+from multiprocessing.sharedctypes import RawArray
+
+from vector import numpy
+from augmented import AugmentedMatrix
+
+#Coefficients of the batch currently being solved, shared with the workers
+shared_coefficients = None
+
+
+def augmented_rows(system):
+    #LinearSystem / AugmentedMatrix / plain rows -> list of [n_1, ..., n_d, k]
+    if isinstance(system, AugmentedMatrix):
+        return system.rows
+    if hasattr(system, 'planes'):
+        return [list(p.normal_vector.coordinates) + [p.constant_term] for p in system.planes]
+    return system
+
+
+def pack_systems(systems):
+    #Lay every augmented matrix out back to back in one flat shared float64
+    #buffer; a system is then just (offset, rows, columns)
+    layouts = []
+    matrices = []
+    total = 0
+    for s in systems:
+        rows = augmented_rows(s)
+        m, n = len(rows), len(rows[0])
+        layouts.append((total, m, n))
+        matrices.append(rows)
+        total += m * n
+
+    buf = RawArray('d', max(total, 1))
+    if numpy is not None:
+        flat = numpy.frombuffer(buf, dtype=numpy.float64)
+        for (offset, m, n), rows in zip(layouts, matrices):
+            flat[offset:offset + m*n] = numpy.asarray(rows, dtype=numpy.float64).ravel()
+    else:
+        for (offset, m, n), rows in zip(layouts, matrices):
+            buf[offset:offset + m*n] = [float(x) for r in rows for x in r]
+    return buf, layouts
+
+
+def init_worker(buf):
+    global shared_coefficients
+    shared_coefficients = buf
+
+
+def solve_packed(task):
+    index, (offset, m, n) = task
+    if numpy is not None:
+        flat = numpy.frombuffer(shared_coefficients, dtype=numpy.float64)
+        rows = flat[offset:offset + m*n].reshape(m, n)
+    else:
+        values = shared_coefficients[offset:offset + m*n]
+        rows = [values[i*n:(i+1)*n] for i in range(m)]
+    return index, AugmentedMatrix(rows).compute_rref().solution()
+
+
+def solve_batch(systems, workers=None, ordered=True, chunksize=None):
+    #Solve independent systems on a process pool. Only (offset, shape) tasks
+    #and the resulting Solution objects cross process boundaries; the
+    #coefficients are read from shared memory. Yields Solutions in input
+    #order as soon as they are ready, or (index, Solution) pairs in
+    #completion order when ordered is False.
+    buf, layouts = pack_systems(systems)
+    tasks = list(enumerate(layouts))
+    if workers is None:
+        workers = cpu_count()
+
+    if workers <= 1 or len(tasks) <= 1:
+        init_worker(buf)
+        for task in tasks:
+            index, solution = solve_packed(task)
+            yield solution if ordered else (index, solution)
+        return
+
+    if chunksize is None:
+        chunksize = max(1, len(tasks) // (4 * workers))
+    pool = Pool(workers, initializer=init_worker, initargs=(buf,))
+    try:
+        if ordered:
+            for index, solution in pool.imap(solve_packed, tasks, chunksize):
+                yield solution
+        else:
+            for result in pool.imap_unordered(solve_packed, tasks, chunksize):
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
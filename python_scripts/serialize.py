@@ -0,0 +1,255 @@
+import struct
+import sys
+from array import array
+
+import vector
+from vector import Vector, numpy, is_ndarray
+from hyperplane import Hyperplane, hyperplane_type
+from line import Line
+from plane import Plane
+from linsys import LinearSystem
+from sparse import SparseSystem
+
+#Binary layout, all little-endian:
+#
+#  header   magic, version, kind, dtype, layout, rows, dimension, nnz, reserved
+#  dense    rows x width float64, row-major
+#  sparse   nnz float64 values, rows float64 constant terms (if the kind has
+#           them), rows+1 uint32 row pointers, nnz uint32 column indices
+#
+#width is dimension, plus one for the constant term of lines, planes,
+#hyperplanes and systems. Float buffers come first so that they stay 8-byte
+#aligned. Payloads are float64 only: dumps rejects Decimal and Fraction
+#values instead of rounding them.
+MAGIC = b'LSYS'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBBIIII')
+
+VECTOR, LINE, PLANE, LINEAR_SYSTEM, SPARSE_SYSTEM, HYPERPLANE = range(6)
+FLOAT64 = 0
+DENSE, SPARSE = 0, 1
+LAYOUTS = (DENSE, SPARSE)
+
+NOT_SERIALIZABLE_MSG = 'Only Vector, Line, Plane, Hyperplane, LinearSystem and SparseSystem can be serialized'
+BAD_MAGIC_MSG = 'Not a serialized linear algebra object'
+UNSUPPORTED_VERSION_MSG = 'Unsupported serialization format version'
+UNKNOWN_LAYOUT_MSG = 'Unknown payload layout'
+TRUNCATED_MSG = 'The serialized data is truncated'
+NOT_FLOAT_MSG = 'Only float and integer values can be serialized, not {}'
+zero_tolerance = 1e-10
+
+
+def to_bytes(buf):
+    #array -> bytes on python 2 and 3
+    if sys.byteorder == 'big':
+        buf = array(buf.typecode, buf)
+        buf.byteswap()
+    return buf.tobytes() if hasattr(buf, 'tobytes') else buf.tostring()
+
+
+def float_buffer(values):
+    if numpy is not None:
+        return numpy.asarray(values, dtype='<f8').tobytes()
+    return to_bytes(array('d', [float(x) for x in values]))
+
+
+def index_buffer(values):
+    if numpy is not None:
+        return numpy.asarray(values, dtype='<u4').tobytes()
+    return to_bytes(array('I', values) if array('I').itemsize == 4 else array('L', values))
+
+
+def read_array(data, offset, count, typecode):
+    #One bulk copy of little-endian items into an array
+    values = array(typecode)
+    chunk = memoryview(data)[offset:offset + values.itemsize*count].tobytes()
+    if hasattr(values, 'frombytes'):
+        values.frombytes(chunk)
+    else:
+        values.fromstring(chunk)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def read_floats(data, offset, count):
+    #Zero-copy numpy view of the buffer when numpy is there
+    if numpy is not None:
+        return numpy.frombuffer(data, dtype='<f8', count=count, offset=offset)
+    return read_array(data, offset, count, 'd')
+
+
+def read_indices(data, offset, count):
+    if numpy is not None:
+        return numpy.frombuffer(data, dtype='<u4', count=count, offset=offset)
+    return read_array(data, offset, count, 'I' if array('I').itemsize == 4 else 'L')
+
+
+def check_floats(values):
+    #One isinstance test per distinct type, not per value
+    for t in set(map(type, values)):
+        if not issubclass(t, vector.FLOAT_TYPES):
+            raise TypeError(NOT_FLOAT_MSG.format(t.__name__))
+
+
+def vector_from_floats(values):
+    #Keep the store that the current vector backend would have made
+    if len(values) >= vector.buffer_dimension:
+        if vector.backend == 'numpy' and is_ndarray(values):
+            return Vector.from_storage(values)
+        if vector.backend == 'array' and isinstance(values, array):
+            return Vector.from_storage(values)
+    return Vector(values.tolist())
+
+
+def describe(obj):
+    #(kind, dense rows [coefficients..., constant], dimension)
+    if isinstance(obj, Vector):
+        return VECTOR, [obj.coordinates], obj.dimension
+    if isinstance(obj, Hyperplane):
+        kind = LINE if isinstance(obj, Line) else PLANE if isinstance(obj, Plane) else HYPERPLANE
+        return kind, [list(obj.normal_vector.coordinates) + [obj.constant_term]], obj.dimension
+    if isinstance(obj, LinearSystem):
+        return (LINEAR_SYSTEM, [list(p.normal_vector.coordinates) + [p.constant_term] for p in obj.planes],
+                obj.dimension)
+    raise TypeError(NOT_SERIALIZABLE_MSG)
+
+
+def compress(rows, has_constant):
+    #CSR arrays of the coefficient part of dense rows
+    indptr, indices, data, rhs = [0], [], [], []
+    for r in rows:
+        coefficients = r[:-1] if has_constant else r
+        for j, x in enumerate(coefficients):
+            if abs(x) >= zero_tolerance:
+                indices.append(j)
+                data.append(x)
+        indptr.append(len(indices))
+        if has_constant:
+            rhs.append(r[-1])
+    return indptr, indices, data, rhs
+
+
+def dumps(obj, layout=None):
+    #layout DENSE or SPARSE; by default whichever is smaller
+    if isinstance(obj, SparseSystem):
+        kind, dimension, has_constant = SPARSE_SYSTEM, obj.dimension, True
+        rows = len(obj)
+        indptr, indices, data, rhs = obj.indptr, obj.indices, obj.data, obj.rhs
+        if layout is None:
+            layout = SPARSE
+        if layout == DENSE:
+            dense = [[0.0] * (dimension + 1) for i in range(rows)]
+            for i in range(rows):
+                for k in range(indptr[i], indptr[i+1]):
+                    dense[i][indices[k]] = data[k]
+                dense[i][dimension] = rhs[i]
+    else:
+        kind, dense, dimension = describe(obj)
+        has_constant = kind != VECTOR
+        rows = len(dense)
+        if layout != DENSE:
+            indptr, indices, data, rhs = compress(dense, has_constant)
+            if layout is None:
+                layout = SPARSE if 12*len(data) + 4*(rows+1) < 8*rows*dimension else DENSE
+
+    if layout not in LAYOUTS:
+        raise ValueError(UNKNOWN_LAYOUT_MSG)
+    if kind != SPARSE_SYSTEM:
+        for r in dense:
+            check_floats(r)
+    if layout == DENSE:
+        header = HEADER.pack(MAGIC, VERSION, kind, FLOAT64, DENSE, rows, dimension, 0, 0)
+        return header + float_buffer([x for r in dense for x in r])
+    header = HEADER.pack(MAGIC, VERSION, kind, FLOAT64, SPARSE, rows, dimension, len(data), 0)
+    return (header + float_buffer(data) + (float_buffer(rhs) if has_constant else b'') +
+            index_buffer(indptr) + index_buffer(indices))
+
+
+def dump(obj, f, layout=None):
+    f.write(dumps(obj, layout))
+
+
+def loads(data):
+    #data may be bytes, a bytearray, a memoryview or an mmap; with numpy the
+    #returned coefficients are read-only views into it, not copies
+    if len(data) < HEADER.size:
+        raise ValueError(TRUNCATED_MSG)
+    magic, version, kind, dtype, layout, rows, dimension, nnz, reserved = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(BAD_MAGIC_MSG)
+    if version != VERSION or dtype != FLOAT64:
+        raise ValueError(UNSUPPORTED_VERSION_MSG)
+    if layout not in LAYOUTS:
+        raise ValueError(UNKNOWN_LAYOUT_MSG)
+
+    has_constant = kind != VECTOR
+    width = dimension + has_constant
+    offset = HEADER.size
+    if layout == DENSE:
+        size = offset + 8*rows*width
+    else:
+        size = offset + 8*nnz + 8*rows*has_constant + 4*(rows+1) + 4*nnz
+    if len(data) < size:
+        raise ValueError(TRUNCATED_MSG)
+
+    if layout == SPARSE:
+        values = read_floats(data, offset, nnz)
+        offset += 8*nnz
+        rhs = read_floats(data, offset, rows) if has_constant else None
+        offset += 8*rows*has_constant
+        indptr = read_indices(data, offset, rows+1)
+        indices = read_indices(data, offset + 4*(rows+1), nnz)
+        if kind == SPARSE_SYSTEM:
+            return SparseSystem.from_csr(indptr, indices, values, rhs, dimension)
+        dense = []
+        for i in range(rows):
+            r = [0.0] * width
+            for k in range(indptr[i], indptr[i+1]):
+                r[indices[k]] = values[k]
+            if has_constant:
+                r[dimension] = rhs[i]
+            dense.append(numpy.array(r) if numpy is not None else array('d', r))
+    else:
+        dense = [read_floats(data, offset + 8*width*i, width) for i in range(rows)]
+        if kind == SPARSE_SYSTEM:
+            indptr, indices, values, rhs = compress([r.tolist() for r in dense], True)
+            return SparseSystem.from_csr(indptr, indices, values, rhs, dimension)
+
+    if kind == VECTOR:
+        return vector_from_floats(dense[0])
+    row_type = hyperplane_type(dimension)
+    equations = [row_type(vector_from_floats(r[:dimension]), float(r[dimension])) for r in dense]
+    if kind == LINEAR_SYSTEM:
+        return LinearSystem(equations)
+    return equations[0]
+
+
+def load(f):
+    return loads(f.read())
+
+
+if __name__ == '__main__':
+    #Serialize/deserialize throughput against pickle
+    import pickle
+    import random
+    from timeit import timeit
+
+    rnd = random.Random(0)
+    dense = LinearSystem([Plane(Vector([rnd.uniform(-10, 10) for i in range(3)]), rnd.uniform(-10, 10))
+                          for j in range(1000)])
+    coefficients = [dict((j, rnd.uniform(-10, 10)) for j in rnd.sample(range(10000), 5))
+                    for i in range(2000)]
+    from sparse import SparseEquation
+    sparse = SparseSystem([SparseEquation(c, rnd.uniform(-10, 10), 10000) for c in coefficients])
+    for name, obj in (('1000 planes', dense), ('2000x10000 sparse system, 5 nnz/row', sparse)):
+        data = dumps(obj)
+        pickled = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        n = 20
+        print('{}: {} bytes, pickle {} bytes'.format(name, len(data), len(pickled)))
+        print('  dumps {:.2f} ms, pickle.dumps {:.2f} ms'.format(
+            1000 * timeit(lambda: dumps(obj), number=n) / n,
+            1000 * timeit(lambda: pickle.dumps(obj, pickle.HIGHEST_PROTOCOL), number=n) / n))
+        print('  loads {:.2f} ms, pickle.loads {:.2f} ms'.format(
+            1000 * timeit(lambda: loads(data), number=n) / n,
+            1000 * timeit(lambda: pickle.loads(pickled), number=n) / n))
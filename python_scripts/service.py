@@ -0,0 +1,301 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+
+from augmented import AugmentedMatrix
+from parallel import augmented_rows
+from solvecache import system_key
+
+#asyncio front end for the solvers (Python 3 only):
+#
+#  solution = await solve_async(system)
+#
+#Every request goes through a bounded queue to one dispatcher task, which
+#hands the elimination to a worker pool. While all workers are busy the
+#dispatcher stops taking requests, the queue fills up and callers wait in
+#solve() instead of piling up unbounded work. Requests for an identical
+#system (same coefficients, constant terms and numeric mode) that is
+#already queued or being solved share that one computation. Small systems
+#that arrive within batch_window of each other go to the pool as one job,
+#so a burst of 3x3 systems pays one round trip instead of hundreds.
+
+SERVICE_CLOSED_MSG = 'The solve service has been closed'
+
+
+def solve_rows(jobs):
+    #Worker side: solve every (rows, numeric, precision) of a batch, keeping
+    #a failure in one system from failing the others
+    results = []
+    for rows, numeric, precision in jobs:
+        if hasattr(rows, 'tolist'):
+            rows = rows.tolist()
+        try:
+            results.append((True, AugmentedMatrix(rows, numeric, precision).compute_rref().solution()))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+def describe(system):
+    #(rows, numeric, precision) of a LinearSystem, AugmentedMatrix or plain
+    #rows of [n_1, ..., n_d, k], numpy rows left for the worker to convert.
+    #The in-flight table is keyed by solvecache.system_key instead, a hash
+    #of the packed buffer rather than a tuple of every entry.
+    rows = augmented_rows(system)
+    return rows, getattr(system, 'numeric', 'float'), getattr(system, 'precision', 30)
+
+
+class SolveService(object):
+
+    #Requests waiting for the dispatcher before solve() starts to block
+    queue_size = 256
+    #Systems with at most this many augmented matrix entries are small
+    #enough to micro-batch, waiting up to batch_window seconds for company
+    small_size = 32
+    batch_window = 0.002
+    max_batch = 64
+
+    def __init__(self, workers=None, executor=None, queue_size=None, batch_window=None, max_batch=None):
+        #executor is any concurrent.futures executor; by default a process
+        #pool with workers processes, owned and shut down by the service
+        self.workers = workers or cpu_count()
+        self.executor = executor
+        self.owns_executor = executor is None
+        if queue_size is not None:
+            self.queue_size = queue_size
+        if batch_window is not None:
+            self.batch_window = batch_window
+        if max_batch is not None:
+            self.max_batch = max_batch
+        self.loop = None
+        self.queue = None
+        self.dispatcher = None
+        self.slots = None
+        self.running = set()
+        self.inflight = {}
+        self.waiters = {}
+        self.handoffs = {}
+        self.closed = False
+        self.stats = {'requests': 0, 'coalesced': 0, 'batches': 0, 'solved': 0}
+
+    def start(self):
+        #Bind to the running loop; solve() does this on first use
+        if self.closed:
+            raise RuntimeError(SERVICE_CLOSED_MSG)
+        if self.dispatcher is None:
+            self.loop = asyncio.get_running_loop()
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(self.workers)
+            self.queue = asyncio.Queue(self.queue_size)
+            self.slots = asyncio.Semaphore(self.workers)
+            self.dispatcher = self.loop.create_task(self.dispatch())
+
+    async def solve(self, system):
+        self.start()
+        self.stats['requests'] += 1
+        key = system_key(system)
+        future = self.inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            self.waiters[key] += 1
+        else:
+            future = self.loop.create_future()
+            self.inflight[key] = future
+            self.waiters[key] = 1
+            future.add_done_callback(lambda f: self.forget(key, f))
+            try:
+                await self.queue.put((describe(system), future))
+            except BaseException:
+                #Cancelled while waiting for room: nobody has the job yet, so
+                #drop it, unless other callers have joined it meanwhile
+                self.waiters[key] -= 1
+                if self.waiters[key]:
+                    self.hand_off((describe(system), future))
+                else:
+                    self.forget(key, future)
+                    future.cancel()
+                raise
+        try:
+            #shield: one caller giving up must not cancel the others' result
+            return await asyncio.shield(future)
+        finally:
+            if self.inflight.get(key) is future:
+                self.waiters[key] -= 1
+
+    def forget(self, key, future):
+        if self.inflight.get(key) is future:
+            del self.inflight[key]
+            del self.waiters[key]
+
+    def hand_off(self, item):
+        #Queue item from a task of its own, for the callers still waiting on
+        #it after the one that was putting it in gave up
+        task = self.loop.create_task(self.queue.put(item))
+        self.handoffs[task] = item
+        task.add_done_callback(lambda t: self.handoffs.pop(t, None))
+
+    def is_small(self, job):
+        rows = job[0]
+        return len(rows) * len(rows[0]) <= self.small_size
+
+    async def dispatch(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.is_small(batch[0][0]):
+                await asyncio.sleep(self.batch_window)
+                large = []
+                while len(batch) < self.max_batch and not self.queue.empty():
+                    item = self.queue.get_nowait()
+                    (batch if self.is_small(item[0]) else large).append(item)
+                await self.submit(batch)
+                for item in large:
+                    await self.submit([item])
+            else:
+                await self.submit(batch)
+
+    async def submit(self, batch):
+        #Waits for a free worker, then runs the batch without waiting for it
+        await self.slots.acquire()
+        self.stats['batches'] += 1
+        task = self.loop.create_task(self.run(batch))
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def run(self, batch):
+        try:
+            results = await self.loop.run_in_executor(self.executor, solve_rows, [job for job, f in batch])
+        except Exception as e:
+            results = [(False, e)] * len(batch)
+        finally:
+            self.slots.release()
+        for (job, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                self.stats['solved'] += 1
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    async def close(self):
+        #Finish what is already running, fail whatever is still queued
+        self.closed = True
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+            try:
+                await self.dispatcher
+            except asyncio.CancelledError:
+                pass
+            for task, (job, future) in list(self.handoffs.items()):
+                task.cancel()
+                if not future.done():
+                    future.set_exception(RuntimeError(SERVICE_CLOSED_MSG))
+            while not self.queue.empty():
+                job, future = self.queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError(SERVICE_CLOSED_MSG))
+            if self.running:
+                await asyncio.gather(*self.running)
+        if self.owns_executor and self.executor is not None:
+            self.executor.shutdown()
+
+    def shutdown(self):
+        #close() for a service whose loop has already stopped: nothing can
+        #be awaited any more, so just release the worker pool. Waiting for
+        #it lets the pool finish cleanly instead of leaving its management
+        #thread to a closed pipe at exit.
+        self.closed = True
+        if self.owns_executor and self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+#The services behind solve_async, one per event loop. Each asyncio.run()
+#makes a new loop; the service of a loop that has since closed is shut down
+#on the next call instead of keeping its worker processes alive.
+default_services = {}
+
+
+async def solve_async(system):
+    #Solution of a LinearSystem, AugmentedMatrix or augmented rows, solved
+    #off the event loop by this loop's default service
+    loop = asyncio.get_running_loop()
+    for other in [l for l in default_services if l.is_closed()]:
+        default_services.pop(other).shutdown()
+    service = default_services.get(loop)
+    if service is None or service.closed:
+        service = default_services[loop] = SolveService()
+    return await service.solve(system)
+
+
+def serviceTest():
+    print("******\nSERVICE")
+    from concurrent.futures import ThreadPoolExecutor
+
+    rows = [[1, 1, 1, 6], [0, 1, 1, 5], [0, 0, 1, 3]]
+
+    async def identical():
+        async with SolveService(workers=2, executor=ThreadPoolExecutor(2)) as service:
+            solutions = await asyncio.gather(*[service.solve(rows) for i in range(5)])
+            return service.stats, solutions
+
+    stats, solutions = asyncio.run(identical())
+    #Five requests for one system: one elimination, four callers share it
+    if not (stats['requests'] == 5 and stats['coalesced'] == 4 and stats['solved'] == 1):
+        print('test case 1 failed')
+    if not all(s is solutions[0] for s in solutions):
+        print('test case 2 failed')
+    if [round(x, 9) for x in solutions[0].basepoint] != [1.0, 2.0, 3.0]:
+        print('test case 3 failed')
+
+    #A second asyncio.run gets its own service and retires the first one
+    asyncio.run(solve_async(rows))
+    first = list(default_services.values())
+    asyncio.run(solve_async(rows))
+    if not (first[0].closed and len(default_services) == 1 and first[0] not in default_services.values()):
+        print('test case 4 failed')
+    for loop in list(default_services):
+        default_services.pop(loop).shutdown()
+
+    import threading
+    gate = threading.Event()
+
+    class GatedExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            return ThreadPoolExecutor.submit(self, lambda: gate.wait() and fn(*args))
+
+    async def cancel_one():
+        #One worker and room for one request, with the worker held: one
+        #system runs, one waits in the dispatcher and one fills the queue,
+        #so the next waits for room; a second caller joins it, and the
+        #first gives up
+        async with SolveService(workers=1, executor=GatedExecutor(1), queue_size=1) as service:
+            others = []
+            for k in range(3):
+                others.append(asyncio.ensure_future(service.solve([[1, 0, k], [0, 1, 1]])))
+                await asyncio.sleep(0.05)
+            first = asyncio.ensure_future(service.solve(rows))
+            await asyncio.sleep(0.05)
+            second = asyncio.ensure_future(service.solve(rows))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            await asyncio.sleep(0.05)
+            gate.set()
+            try:
+                solution = await asyncio.wait_for(second, 5)
+            except asyncio.CancelledError:
+                solution = None
+            await asyncio.gather(*others, return_exceptions=True)
+            return first.cancelled(), solution, service.inflight
+
+    cancelled, solution, inflight = asyncio.run(cancel_one())
+    if not (cancelled and solution is not None and [round(x, 9) for x in solution.basepoint] == [1.0, 2.0, 3.0]):
+        print('test case 5 failed')
+    if inflight:
+        print('test case 6 failed')
@@ -0,0 +1,74 @@
+class Solution(object):
+
+    NO_SOLUTIONS_MSG = 'No solutions'
+    INF_SOLUTIONS_MSG = 'Infinitely many solutions'
+
+    UNIQUE = 'unique'
+    NONE = 'none'
+    INFINITE = 'infinite'
+
+    #Solution set of a linear system: nothing, one point (basepoint), or the
+    #affine set basepoint + span(direction_vectors). rank is the number of
+    #pivots found by the elimination that produced it.
+    def __init__(self, kind, basepoint=None, direction_vectors=(), rank=None):
+        self.kind = kind
+        self.basepoint = basepoint
+        self.direction_vectors = list(direction_vectors)
+        self.rank = rank
+
+    @classmethod
+    def none(cls, rank=None):
+        return cls(cls.NONE, rank=rank)
+
+    def is_unique(self):
+        return self.kind == self.UNIQUE
+
+    def is_inconsistent(self):
+        return self.kind == self.NONE
+
+    def is_infinite(self):
+        return self.kind == self.INFINITE
+
+    def dimension(self):
+        #Dimension of the solution set; -1 when there is none
+        if self.kind == self.NONE:
+            return -1
+        return len(self.direction_vectors)
+
+    def __str__(self):
+        if self.kind == self.NONE:
+            return self.NO_SOLUTIONS_MSG
+        if self.kind == self.UNIQUE:
+            return 'Unique solution: ' + ', '.join(
+                'x_{} = {}'.format(i+1, round(x, 3)) for i, x in enumerate(self.basepoint.coordinates))
+        ret = self.INF_SOLUTIONS_MSG + ':\n'
+        ret += 'Basepoint: {}\n'.format(self.basepoint)
+        ret += '\n'.join('Direction {}: {}'.format(i+1, v) for i, v in enumerate(self.direction_vectors))
+        return ret
+
+
+def solutionTest():
+    print("******\nSOLUTION")
+    from vector import Vector
+    from plane import Plane
+    from linsys import LinearSystem
+
+    def satisfies(planes, point):
+        return all(abs(p.normal_vector.dotprod(point) - p.constant_term) < 1e-9 for p in planes)
+
+    planes = [Plane(Vector([0, 1, 1]), 1), Plane(Vector([1, -1, 1]), 2), Plane(Vector([1, 2, -5]), 3)]
+    s = LinearSystem(planes).solve()
+    if not (s.is_unique() and s.dimension() == 0 and s.rank == 3 and satisfies(planes, s.basepoint)):
+        print('test case 1 failed')
+
+    s = LinearSystem([Plane(Vector([1, 1, 1]), 1), Plane(Vector([1, 1, 1]), 2)]).solve()
+    if not (s.is_inconsistent() and s.dimension() == -1 and str(s) == Solution.NO_SOLUTIONS_MSG):
+        print('test case 2 failed')
+
+    #A line of solutions: every basepoint + t * direction solves the system
+    planes = [Plane(Vector([1, 1, 1]), 1), Plane(Vector([0, 1, 1]), 2)]
+    s = LinearSystem(planes).solve()
+    if not (s.is_infinite() and s.dimension() == 1 and s.rank == 2):
+        print('test case 3 failed')
+    elif not all(satisfies(planes, s.basepoint.add(s.direction_vectors[0].scalar(t))) for t in (-2, 0.5, 3)):
+        print('test case 4 failed')
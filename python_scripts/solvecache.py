@@ -0,0 +1,347 @@
+import hashlib
+import json
+import numbers
+import os
+import struct
+from array import array
+from collections import OrderedDict
+from decimal import Decimal
+from fractions import Fraction
+
+from vector import Vector, numpy, is_ndarray
+from augmented import AugmentedMatrix
+from parallel import augmented_rows
+from solution import Solution
+
+#Solutions of recently solved systems, addressed by a digest of their packed
+#[A | b] buffer, so that a repeated system costs one hash instead of an
+#elimination:
+#
+#  cache = SolveCache(max_bytes=2**26, path='solves')
+#  solution = system.solve(cache=cache)
+#
+#Entries are evicted least recently used first once there are more than
+#max_entries of them or their estimated size passes max_bytes. With a path,
+#every solution is also written there, one file per digest, and a miss in
+#memory looks on disk before solving, so a restarted process keeps its hits.
+#The files are plain JSON, so reading one can not run code, and they are
+#evicted least recently used first once they take more than max_disk_bytes.
+#The cached Solution objects are shared between callers and must not be
+#changed.
+
+#numeric mode, precision, rows, columns
+KEY_HEADER = struct.Struct('<8sIII')
+BAD_ENTRY_MSG = 'Not a cached solution'
+#Rough size of an entry besides its coordinates
+ENTRY_OVERHEAD = 400
+EXTENSION = '.solution'
+
+#os.rename does not overwrite on Windows
+replace = getattr(os, 'replace', os.rename)
+
+#Parsers for the exact coordinates a file stores as text
+EXACT_TYPES = {'decimal': Decimal, 'fraction': Fraction}
+
+
+def pack(system):
+    #Numeric mode, precision and shape followed by [A | b], for a
+    #LinearSystem, AugmentedMatrix or rows of [n_1, ..., n_d, k]. Float
+    #systems are packed as float64, decimal and fraction ones by the exact
+    #text of each value.
+    numeric = getattr(system, 'numeric', 'float')
+    precision = getattr(system, 'precision', 30)
+    rows = augmented_rows(system)
+    m, n = len(rows), len(rows[0])
+    if numeric != 'float':
+        data = '\x00'.join(repr(x) for r in rows for x in r).encode('utf-8')
+    elif is_ndarray(rows):
+        data = numpy.ascontiguousarray(rows, dtype='<f8').tobytes()
+    else:
+        values = array('d')
+        try:
+            for r in rows:
+                values.extend(r)
+        except TypeError:
+            #Decimal, Fraction or another number array('d') does not take
+            values = array('d', [float(x) for r in rows for x in r])
+        data = values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+    return KEY_HEADER.pack(numeric.encode('ascii'), precision, m, n) + data
+
+
+def system_key(system):
+    return hashlib.sha1(pack(system)).hexdigest()
+
+
+def entry_size(solution):
+    vectors = [solution.basepoint] if solution.basepoint is not None else []
+    vectors += solution.direction_vectors
+    return ENTRY_OVERHEAD + sum(8 * v.dimension for v in vectors)
+
+
+def encode_value(x):
+    #JSON numbers for floats and ints, exact text for Decimal and Fraction
+    if isinstance(x, (float, numbers.Integral)):
+        return x
+    return str(x)
+
+
+def solution_to_json(solution):
+    vectors = [solution.basepoint] if solution.basepoint is not None else []
+    vectors += solution.direction_vectors
+    values = [x for v in vectors for x in v.coordinates]
+    numeric = 'float'
+    if any(isinstance(x, Decimal) for x in values):
+        numeric = 'decimal'
+    elif any(isinstance(x, Fraction) for x in values):
+        numeric = 'fraction'
+    return json.dumps({
+        'kind': solution.kind,
+        'rank': solution.rank,
+        'numeric': numeric,
+        'basepoint': None if solution.basepoint is None else [encode_value(x) for x in solution.basepoint.coordinates],
+        'directions': [[encode_value(x) for x in v.coordinates] for v in solution.direction_vectors],
+    })
+
+
+def solution_from_json(text):
+    data = json.loads(text)
+    parse = EXACT_TYPES.get(data['numeric'])
+
+    def to_vector(values):
+        if parse is not None:
+            values = [x if isinstance(x, numbers.Number) else parse(x) for x in values]
+        return Vector(values)
+
+    if data['kind'] not in (Solution.UNIQUE, Solution.NONE, Solution.INFINITE):
+        raise ValueError(BAD_ENTRY_MSG)
+    basepoint = None if data['basepoint'] is None else to_vector(data['basepoint'])
+    return Solution(data['kind'], basepoint, [to_vector(v) for v in data['directions']], data['rank'])
+
+
+def default_solver(system):
+    if hasattr(system, 'planes'):
+        return system.solve()
+    if isinstance(system, AugmentedMatrix):
+        return AugmentedMatrix(system.rows, system.numeric, system.precision).compute_rref().solution()
+    return AugmentedMatrix(system).compute_rref().solution()
+
+
+class SolveCache(object):
+
+    max_entries = 4096
+    max_bytes = 64 * 2**20
+    max_disk_bytes = 256 * 2**20
+
+    def __init__(self, max_entries=None, max_bytes=None, path=None, solver=default_solver, max_disk_bytes=None):
+        #solver(system) -> Solution computes what is not cached
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if max_disk_bytes is not None:
+            self.max_disk_bytes = max_disk_bytes
+        self.path = path
+        self.solver = solver
+        self.entries = OrderedDict()
+        self.bytes = 0
+        #key -> file size, least recently used first
+        self.files = OrderedDict()
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if path is not None:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self.scan()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, system):
+        return system_key(system) in self.entries
+
+    def file_path(self, key):
+        return os.path.join(self.path, key + EXTENSION)
+
+    def lookup(self, key):
+        #Solution for key or None, moving it to the most recently used end
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.entries[key] = entry
+            self.hits += 1
+            return entry[0]
+        if self.path is not None:
+            solution = self.read(key)
+            if solution is not None:
+                self.disk_hits += 1
+                self.insert(key, solution)
+                return solution
+        self.misses += 1
+        return None
+
+    def get(self, system, default=None):
+        solution = self.lookup(system_key(system))
+        return default if solution is None else solution
+
+    def put(self, system, solution):
+        key = system_key(system)
+        self.insert(key, solution)
+        if self.path is not None:
+            self.write(key, solution)
+
+    def solve(self, system):
+        key = system_key(system)
+        solution = self.lookup(key)
+        if solution is None:
+            solution = self.solver(system)
+            self.insert(key, solution)
+            if self.path is not None:
+                self.write(key, solution)
+        return solution
+
+    def insert(self, key, solution):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        size = entry_size(solution)
+        self.entries[key] = (solution, size)
+        self.bytes += size
+        self.evict()
+
+    def evict(self):
+        #The entry just inserted stays even if it alone is over max_bytes
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            key, (solution, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+    def scan(self):
+        #Files left by earlier runs, oldest modification first
+        found = []
+        for name in os.listdir(self.path):
+            if name.endswith(EXTENSION):
+                stat = os.stat(os.path.join(self.path, name))
+                found.append((stat.st_mtime, name[:-len(EXTENSION)], stat.st_size))
+        for mtime, key, size in sorted(found):
+            self.files[key] = size
+            self.disk_bytes += size
+        self.evict_files()
+
+    def remove_file(self, key):
+        self.disk_bytes -= self.files.pop(key, 0)
+        try:
+            os.remove(self.file_path(key))
+        except OSError:
+            pass
+
+    def evict_files(self):
+        #The file just written stays even if it alone is over max_disk_bytes
+        while len(self.files) > 1 and self.disk_bytes > self.max_disk_bytes:
+            self.remove_file(next(iter(self.files)))
+            self.disk_evictions += 1
+
+    def read(self, key):
+        #A file that can not be read back is dropped and counts as a miss
+        name = self.file_path(key)
+        if not os.path.exists(name):
+            return None
+        try:
+            with open(name) as f:
+                solution = solution_from_json(f.read())
+        except Exception:
+            self.remove_file(key)
+            return None
+        #Move it to the recently used end, on disk too so that the order
+        #survives a restart
+        if key in self.files:
+            self.files[key] = self.files.pop(key)
+        else:
+            self.files[key] = os.path.getsize(name)
+            self.disk_bytes += self.files[key]
+        try:
+            os.utime(name, None)
+        except OSError:
+            pass
+        return solution
+
+    def write(self, key, solution):
+        #Write then rename, so readers never see half a file
+        name = self.file_path(key)
+        temporary = '{}.{}.tmp'.format(name, os.getpid())
+        with open(temporary, 'w') as f:
+            f.write(solution_to_json(solution))
+        replace(temporary, name)
+        self.disk_bytes -= self.files.pop(key, 0)
+        self.files[key] = os.path.getsize(name)
+        self.disk_bytes += self.files[key]
+        self.evict_files()
+
+    def clear(self, disk=False):
+        self.entries.clear()
+        self.bytes = 0
+        if disk and self.path is not None:
+            for name in os.listdir(self.path):
+                if name.endswith(EXTENSION):
+                    os.remove(os.path.join(self.path, name))
+            self.files.clear()
+            self.disk_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'disk_bytes': self.disk_bytes,
+            'disk_evictions': self.disk_evictions,
+            'hit_rate': float(self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+def cacheTest():
+    print("******\nSOLVE CACHE")
+    import shutil
+    import tempfile
+
+    systems = [[[1, 0, i], [0, 1, -i]] for i in range(5)]
+
+    cache = SolveCache(max_entries=3)
+    for system in systems:
+        cache.solve(system)
+    #Least recently used first: the first two systems are gone
+    if not (len(cache) == 3 and cache.evictions == 2 and systems[0] not in cache and systems[4] in cache):
+        print('test case 1 failed')
+
+    cache = SolveCache(max_bytes=2 * entry_size(default_solver(systems[0])))
+    for system in systems:
+        cache.solve(system)
+    if not (len(cache) == 2 and cache.bytes <= cache.max_bytes):
+        print('test case 2 failed')
+
+    path = tempfile.mkdtemp()
+    try:
+        cache = SolveCache(path=path)
+        exact = AugmentedMatrix([[3, 1, 1], [1, 3, 2]], 'fraction')
+        solution = cache.solve(exact)
+        #A restarted process reads the exact solution back from disk
+        again = SolveCache(path=path).get(exact)
+        if again is None or again.basepoint.coordinates != solution.basepoint.coordinates:
+            print('test case 3 failed')
+        if again is not None and not isinstance(again.basepoint.coordinates[0], Fraction):
+            print('test case 4 failed')
+
+        size = cache.disk_bytes
+        cache = SolveCache(path=path, max_disk_bytes=3 * size)
+        for system in systems:
+            cache.solve(system)
+        files = [name for name in os.listdir(path) if name.endswith(EXTENSION)]
+        if not (len(files) == 3 and cache.disk_bytes <= cache.max_disk_bytes and cache.disk_evictions == 3):
+            print('test case 5 failed')
+    finally:
+        shutil.rmtree(path)
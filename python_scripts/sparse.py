@@ -0,0 +1,234 @@
+from array import array
+from heapq import heappush, heappop
+
+from vector import Vector, is_ndarray
+from solution import Solution
+import iterative
+
+
+def csr_buffer(values, typecode):
+    #values itself if it already is a flat numeric buffer, else an array copy
+    if isinstance(values, array) or is_ndarray(values):
+        return values
+    if isinstance(values, memoryview) and values.format not in ('B', 'c'):
+        return values
+    return array(typecode, values)
+
+
+class SparseEquation(object):
+
+    INDEX_OUT_OF_RANGE_MSG = 'Coefficient index outside the dimension of the equation'
+    NO_NONZERO_ELTS_FOUND_MSG = 'No nonzero elements found'
+
+    zero_tolerance = 1e-10
+
+    #Equation sum(coefficients[i] * x_i) = constant_term storing only the
+    #nonzero coefficients as an index -> coefficient dict
+    def __init__(self, coefficients, constant_term=0, dimension=None):
+        coefficients = dict((int(i), float(c)) for i, c in coefficients.items()
+                            if abs(c) >= self.zero_tolerance)
+        if dimension is None:
+            dimension = max(coefficients) + 1 if coefficients else 0
+        for i in coefficients:
+            if not 0 <= i < dimension:
+                raise IndexError(self.INDEX_OUT_OF_RANGE_MSG)
+        self.coefficients = coefficients
+        self.constant_term = float(constant_term)
+        self.dimension = dimension
+
+    @classmethod
+    def from_plane(cls, p):
+        n = p.normal_vector
+        return cls(dict(enumerate(n)), p.constant_term, n.dimension)
+
+    def first_nonzero_index(self):
+        if not self.coefficients:
+            raise Exception(self.NO_NONZERO_ELTS_FOUND_MSG)
+        return min(self.coefficients)
+
+    def to_vector(self):
+        coords = [0.0] * self.dimension
+        for i, c in self.coefficients.items():
+            coords[i] = c
+        return Vector(coords)
+
+    def __len__(self):
+        return len(self.coefficients)
+
+    def __str__(self):
+        terms = ['{:+.3f}x_{}'.format(c, i+1) for i, c in sorted(self.coefficients.items())]
+        return '{} = {:.3f}'.format(' '.join(terms) if terms else '0', self.constant_term)
+
+
+class SparseSystem(object):
+
+    ALL_EQUATIONS_MUST_BE_IN_SAME_DIM_MSG = 'All equations in the system should live in the same dimension'
+    NO_SOLUTIONS_MSG = Solution.NO_SOLUTIONS_MSG
+    INF_SOLUTIONS_MSG = Solution.INF_SOLUTIONS_MSG
+
+    zero_tolerance = 1e-10
+    #Threshold partial pivoting: a pivot may be up to 10x smaller than the
+    #largest entry in its column if that keeps the fill down
+    pivot_threshold = 0.1
+
+    #Whole system in compressed sparse row form: the column indices and values
+    #of row i are indices/data[indptr[i]:indptr[i+1]], sorted by column
+    def __init__(self, equations, dimension=None):
+        if dimension is None:
+            dimension = equations[0].dimension
+        indptr = array('l', [0])
+        indices = array('l')
+        data = array('d')
+        rhs = array('d')
+        for e in equations:
+            if e.dimension != dimension:
+                raise Exception(self.ALL_EQUATIONS_MUST_BE_IN_SAME_DIM_MSG)
+            for i in sorted(e.coefficients):
+                indices.append(i)
+                data.append(e.coefficients[i])
+            indptr.append(len(indices))
+            rhs.append(e.constant_term)
+
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.rhs = rhs
+        self.dimension = dimension
+
+    @classmethod
+    def from_planes(cls, planes):
+        return cls([SparseEquation.from_plane(p) for p in planes])
+
+    @classmethod
+    def from_csr(cls, indptr, indices, data, rhs, dimension):
+        #Take compressed rows as they are (columns sorted within each row)
+        #without building a SparseEquation per row. Arrays, numpy arrays and
+        #typed memoryviews are used without copying, e.g. views into a
+        #serialized buffer; the system only reads them.
+        system = cls([], dimension)
+        system.indptr = csr_buffer(indptr, 'l')
+        system.indices = csr_buffer(indices, 'l')
+        system.data = csr_buffer(data, 'd')
+        system.rhs = csr_buffer(rhs, 'd')
+        return system
+
+    def __len__(self):
+        return len(self.rhs)
+
+    def __getitem__(self, i):
+        start, end = self.indptr[i], self.indptr[i+1]
+        return SparseEquation(dict(zip(self.indices[start:end], self.data[start:end])),
+                              self.rhs[i], self.dimension)
+
+    def __str__(self):
+        ret = 'Sparse Linear System:\n'
+        temp = ['Equation {}: {}'.format(i+1, self[i]) for i in range(len(self))]
+        ret += '\n'.join(temp)
+        return ret
+
+    def nnz(self):
+        return len(self.data)
+
+    def indices_of_first_nonzero_terms_in_each_row(self):
+        #Columns are sorted within each row, so this is one lookup per row
+        indptr = self.indptr
+        return [self.indices[indptr[i]] if indptr[i] < indptr[i+1] else -1
+                for i in range(len(self))]
+
+    def solve_iterative(self, method='gmres', x0=None, tol=1e-10, maxiter=None, **options):
+        return iterative.solve(self, method, x0, tol, maxiter, **options)
+
+    def solve(self):
+        #Sparse Gaussian elimination with Markowitz-style ordering: always
+        #eliminate the active column with the fewest nonzeros, and within it
+        #the shortest acceptable row (largest entry on ties), so little
+        #fill-in is created. Returns a Solution like LinearSystem.solve().
+        rows = []
+        rhs = list(self.rhs)
+        cols = {}
+        for i in range(len(self)):
+            start, end = self.indptr[i], self.indptr[i+1]
+            rows.append(dict(zip(self.indices[start:end], self.data[start:end])))
+            for j in self.indices[start:end]:
+                cols.setdefault(j, set()).add(i)
+
+        heap = [(len(r), j) for j, r in cols.items()]
+        heap.sort()
+        pivots = []
+        while heap:
+            count, c = heappop(heap)
+            candidates = cols.get(c)
+            if not candidates:
+                continue
+            if count != len(candidates):
+                heappush(heap, (len(candidates), c))
+                continue
+
+            largest = max(abs(rows[i][c]) for i in candidates)
+            if largest < self.zero_tolerance:
+                continue
+            eligible = [i for i in candidates if abs(rows[i][c]) >= self.pivot_threshold * largest]
+            r = min(eligible, key=lambda i: (len(rows[i]), -abs(rows[i][c])))
+            pivot_row = rows[r]
+            pivot = pivot_row[c]
+
+            for j in pivot_row:
+                cols[j].discard(r)
+            del cols[c]
+
+            touched = set(pivot_row)
+            touched.discard(c)
+            for i in candidates:
+                if i == r:
+                    continue
+                row = rows[i]
+                alpha = row.pop(c) / pivot
+                for j, v in pivot_row.items():
+                    if j == c:
+                        continue
+                    new = row.get(j, 0.0) - alpha * v
+                    if abs(new) < self.zero_tolerance:
+                        if j in row:
+                            del row[j]
+                            cols[j].discard(i)
+                            touched.add(j)
+                    else:
+                        if j not in row:
+                            cols[j].add(i)
+                            touched.add(j)
+                        row[j] = new
+                rhs[i] -= alpha * rhs[r]
+            for j in touched:
+                heappush(heap, (len(cols[j]), j))
+            pivots.append((r, c))
+
+        rank = len(pivots)
+        pivoted_rows = set(r for r, c in pivots)
+        for i in range(len(rows)):
+            if i not in pivoted_rows and abs(rhs[i]) >= self.zero_tolerance:
+                return Solution.none(rank)
+
+        def back_substitute(x, constants):
+            #A pivot row only holds columns pivoted after it or free ones
+            for r, c in reversed(pivots):
+                row = rows[r]
+                total = constants[r]
+                for j, v in row.items():
+                    if j != c:
+                        total -= v * x[j]
+                x[c] = total / row[c]
+            return Vector(x)
+
+        basepoint = back_substitute([0.0] * self.dimension, rhs)
+        if rank == self.dimension:
+            return Solution(Solution.UNIQUE, basepoint, rank=rank)
+
+        pivot_columns = set(c for r, c in pivots)
+        zeros = [0.0] * len(rows)
+        directions = []
+        for free in range(self.dimension):
+            if free not in pivot_columns:
+                x = [0.0] * self.dimension
+                x[free] = 1.0
+                directions.append(back_substitute(x, zeros))
+        return Solution(Solution.INFINITE, basepoint, directions, rank)
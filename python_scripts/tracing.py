@@ -0,0 +1,168 @@
+import json
+import numbers
+import struct
+from decimal import localcontext
+from fractions import Fraction
+
+
+class Tracer(object):
+
+    #Observer for elimination steps. Solvers only call a tracer when one is
+    #attached (their tracer attribute defaults to None), so untraced solves
+    #pay nothing; subclass this and override the events you need.
+    def pivot_chosen(self, row, col, value):
+        pass
+
+    def rows_swapped(self, row1, row2):
+        pass
+
+    def row_scaled(self, coefficient, row):
+        pass
+
+    def row_added(self, coefficient, row_to_add, row_to_be_added_to):
+        pass
+
+
+class StepRecorder(Tracer):
+
+    UNKNOWN_FORMAT_MSG = 'Unknown step log format'
+    BAD_RECORD_MSG = 'Corrupt step log record'
+
+    PIVOT = 'pivot'
+    SWAP = 'swap'
+    SCALE = 'scale'
+    ADD = 'add'
+
+    FORMATS = ('jsonl', 'binary')
+    #Binary records: event code, two row/column indices and one float64
+    RECORD = struct.Struct('<Biid')
+    CODES = {PIVOT: 0, SWAP: 1, SCALE: 2, ADD: 3}
+    KINDS = dict((code, kind) for kind, code in CODES.items())
+
+    #Keeps every event as a (kind, a, b, value) tuple, and optionally streams
+    #it to stream (a file opened in text mode for jsonl, binary mode for
+    #binary) as it happens. replay() applies the row operations to anything
+    #with swap_rows/multiply_coefficient_and_row/add_multiple_times_row_to_row,
+    #e.g. a LinearSystem or an AugmentedMatrix.
+    #
+    #Values are kept as the solver passed them (float, Decimal, Fraction or
+    #int), so a decimal or fraction trace replays exactly. jsonl writes
+    #Decimal and Fraction values as text and reads them back as Fractions;
+    #binary records hold float64 and round them.
+    def __init__(self, stream=None, format='jsonl'):
+        if format not in self.FORMATS:
+            raise ValueError(self.UNKNOWN_FORMAT_MSG)
+        self.events = []
+        self.stream = stream
+        self.format = format
+
+    def record(self, kind, a, b, value):
+        event = (kind, a, b, value)
+        self.events.append(event)
+        if self.stream is not None:
+            self.write_event(self.stream, event, self.format)
+
+    def pivot_chosen(self, row, col, value):
+        self.record(self.PIVOT, row, col, value)
+
+    def rows_swapped(self, row1, row2):
+        self.record(self.SWAP, row1, row2, 0)
+
+    def row_scaled(self, coefficient, row):
+        self.record(self.SCALE, row, -1, coefficient)
+
+    def row_added(self, coefficient, row_to_add, row_to_be_added_to):
+        self.record(self.ADD, row_to_add, row_to_be_added_to, coefficient)
+
+    def __len__(self):
+        return len(self.events)
+
+    @classmethod
+    def write_event(cls, stream, event, format):
+        kind, a, b, value = event
+        if format == 'jsonl':
+            if not isinstance(value, (float, numbers.Integral)):
+                value = str(value)
+            stream.write(json.dumps([kind, a, b, value]) + '\n')
+        else:
+            stream.write(cls.RECORD.pack(cls.CODES[kind], a, b, float(value)))
+
+    def save(self, stream, format='jsonl'):
+        if format not in self.FORMATS:
+            raise ValueError(self.UNKNOWN_FORMAT_MSG)
+        for event in self.events:
+            self.write_event(stream, event, format)
+
+    @classmethod
+    def load(cls, stream, format='jsonl'):
+        recorder = cls()
+        if format == 'jsonl':
+            for line in stream:
+                if line.strip():
+                    kind, a, b, value = json.loads(line)
+                    if not isinstance(value, (float, numbers.Integral)):
+                        #Fraction parses both '0.1' and '1/3' exactly
+                        value = Fraction(value)
+                    recorder.events.append((str(kind), a, b, value))
+        elif format == 'binary':
+            data = stream.read()
+            if len(data) % cls.RECORD.size:
+                raise ValueError(cls.BAD_RECORD_MSG)
+            for offset in range(0, len(data), cls.RECORD.size):
+                code, a, b, value = cls.RECORD.unpack_from(data, offset)
+                recorder.events.append((cls.KINDS[code], a, b, value))
+        else:
+            raise ValueError(cls.UNKNOWN_FORMAT_MSG)
+        return recorder
+
+    def replay(self, system):
+        #Values are converted to the system's own arithmetic first: an
+        #AugmentedMatrix's numeric mode (in its decimal context), plain
+        #float for anything else
+        converters = getattr(system, 'CONVERTERS', None)
+        convert = converters[system.numeric] if converters is not None else float
+        context = getattr(system, 'context', None)
+        with localcontext(context):
+            for kind, a, b, value in self.events:
+                if kind == self.SWAP:
+                    system.swap_rows(a, b)
+                elif kind == self.SCALE:
+                    system.multiply_coefficient_and_row(convert(value), a)
+                elif kind == self.ADD:
+                    system.add_multiple_times_row_to_row(convert(value), a, b)
+        return system
+
+
+def replayTest():
+    print("******\nREPLAY")
+    import os
+    import tempfile
+    from decimal import Decimal
+    from augmented import AugmentedMatrix
+
+    rows = [[2, 1, -1, 8], [-3, -1, 2, -11], [-2, 1, 2, -3]]
+
+    recorder = StepRecorder()
+    solved = AugmentedMatrix(rows, 'decimal', 40, recorder).compute_triangular_form()
+    replayed = recorder.replay(AugmentedMatrix(rows, 'decimal', 40))
+    if not all(isinstance(x, Decimal) for r in replayed.rows for x in r):
+        print('test case 1 failed')
+    if max(abs(x - y) for r, s in zip(solved.rows, replayed.rows) for x, y in zip(r, s)) > Decimal('1e-35'):
+        print('test case 2 failed')
+
+    recorder = StepRecorder()
+    solved = AugmentedMatrix(rows, 'fraction', tracer=recorder).compute_triangular_form()
+    if recorder.replay(AugmentedMatrix(rows, 'fraction')).rows != solved.rows:
+        print('test case 3 failed')
+
+    #Exact values survive the jsonl round trip
+    fd, name = tempfile.mkstemp('.jsonl')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            recorder.save(f)
+        with open(name) as f:
+            loaded = StepRecorder.load(f)
+    finally:
+        os.remove(name)
+    if loaded.replay(AugmentedMatrix(rows, 'fraction')).rows != solved.rows:
+        print('test case 4 failed')
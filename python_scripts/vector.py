@@ -1,18 +1,145 @@
+import sys
 from math import acos
-from decimal import Decimal, getcontext
+from array import array
+from operator import mul
+
+
+def module_available(name):
+    #Whether name can be imported, without importing it
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        import imp
+        try:
+            imp.find_module(name)
+        except ImportError:
+            return False
+        return True
+    return find_spec(name) is not None
+
+
+class LazyModule(object):
+
+    #Stand-in for an optional module that is installed but not imported
+    #yet: the first attribute lookup imports it, so importing this package
+    #does not pay for numpy until numpy is actually used. Its own names all
+    #start with an underscore so that every public name, numpy.load
+    #included, is the real module's.
+    def __init__(self, name, on_import=None):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_on_import', on_import)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        if self._module is None:
+            module = __import__(self._name)
+            object.__setattr__(self, '_module', module)
+            if self._on_import is not None:
+                self._on_import(module)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        return '<lazy module {!r}>'.format(self._name)
+
+
+def is_loaded(module):
+    #False for a LazyModule that has not been imported by anyone yet; no
+    #object can be one of its types then
+    return module is not None and (module._module is not None or module._name in sys.modules)
+
+try:
+    from itertools import imap
+except ImportError:
+    imap = map
+
+try:
+    FLOAT_TYPES = (int, long, float)
+except NameError:
+    FLOAT_TYPES = (int, float)
+INEXACT_TYPES = (float,)
+
+
+def add_numpy_types(module):
+    global FLOAT_TYPES, INEXACT_TYPES
+    FLOAT_TYPES += (module.integer, module.floating)
+    INEXACT_TYPES += (module.floating,)
+
+
+numpy = LazyModule('numpy', add_numpy_types) if module_available('numpy') else None
 
-getcontext().prec = 30
 tolerance = 1e-10
 
+#Backing store for float coordinates: 'numpy', 'array' (array('d')) or 'tuple'.
+#Without numpy the default is tuples: a python loop over an array('d') is
+#slower than over a tuple at every size, so 'array' only saves memory.
+BACKENDS = ('numpy', 'array', 'tuple')
+backend = 'numpy' if numpy is not None else 'tuple'
+
+#Vectors shorter than this keep tuple storage whatever the backend; below it
+#the per-call cost of a numpy operation is more than the python loop's
+buffer_dimension = 16
+
+UNKNOWN_BACKEND_MSG = 'Unknown vector backend'
+NUMPY_NOT_AVAILABLE_MSG = 'The numpy backend requires numpy to be installed'
+
+
+def set_backend(name):
+    global backend
+    if name not in BACKENDS:
+        raise ValueError(UNKNOWN_BACKEND_MSG)
+    if name == 'numpy' and numpy is None:
+        raise ImportError(NUMPY_NOT_AVAILABLE_MSG)
+    backend = name
+
+
+def is_ndarray(data):
+    return is_loaded(numpy) and isinstance(data, numpy.ndarray)
+
+
+def pack(values):
+    #Float coordinates of buffer_dimension or more go into one contiguous
+    #float64 buffer; short vectors and exact coordinates (all ints, Decimal,
+    #Fraction, ...) keep the generic tuple storage
+    if isinstance(values, Vector):
+        return values._data
+    if is_ndarray(values):
+        if backend == 'numpy' and len(values) >= buffer_dimension:
+            return numpy.ascontiguousarray(values, dtype=numpy.float64)
+        values = values.tolist()
+    values = tuple(values)
+    if (backend == 'tuple' or len(values) < buffer_dimension or not all(isinstance(x, FLOAT_TYPES) for x in values)
+            or not any(isinstance(x, INEXACT_TYPES) for x in values)):
+        return values
+    if backend == 'numpy':
+        return numpy.array(values, dtype=numpy.float64)
+    return array('d', values)
+
+
+def quantize(values, step=None):
+    #Round every value to a multiple of step (tolerance by default); equal
+    #tuples are how vectors, lines and planes compare and hash
+    step = step or tolerance
+    return tuple(int(round(float(x) / step)) for x in values)
+
+
+def same_storage(a, b):
+    #True when both stores can be handed to the same vectorized kernel
+    return type(a) is type(b) and not isinstance(a, tuple)
 
 
 class Vector(object):
+    __slots__ = ('_data', '_coordinates', 'dimension')
+
     def __init__(self, coordinates):
         try:
-            if not coordinates:
+            if len(coordinates) == 0:
                 raise ValueError
-            self.coordinates = tuple(coordinates)
-            self.dimension = len(coordinates)
+            self._data = pack(coordinates)
+            self._coordinates = None
+            self.dimension = len(self._data)
 
         except ValueError:
             raise ValueError('The coordinates must be nonempty')
@@ -20,57 +147,121 @@ class Vector(object):
         except TypeError:
             raise TypeError('The coordinates must be an iterable')
 
+    @classmethod
+    def from_storage(cls, data):
+        #Wrap an already packed store without re-validating it
+        v = cls.__new__(cls)
+        v._data = data
+        v._coordinates = None
+        v.dimension = len(data)
+        return v
+
+    @property
+    def coordinates(self):
+        if self._coordinates is None:
+            if is_ndarray(self._data):
+                self._coordinates = tuple(self._data.tolist())
+            else:
+                self._coordinates = tuple(self._data)
+        return self._coordinates
 
     def __str__(self):
         return 'Vector: {}'.format(self.coordinates)
 
+    def canonical(self, step=None):
+        return quantize(self.coordinates, step)
+
+    def direction(self, step=None):
+        #Quantized unit vector with its first nonzero coordinate positive, and
+        #the sign (1 or -1) that took; (None, 0) for the zero vector
+        size = float(self.magnitude())
+        if size < (step or tolerance):
+            return None, 0
+        key = quantize([float(x) / size for x in self.coordinates], step)
+        for k in key:
+            if k:
+                if k < 0:
+                    return tuple(-x for x in key), -1
+                break
+        return key, 1
+
     def __eq__(self, v):
-        return self.coordinates == v.coordinates
+        #Equal when the quantized coordinates are, the same key __hash__
+        #uses, so equal vectors always hash alike. Values a hair apart on
+        #either side of a bucket edge are unequal; geoindex.HyperplaneIndex
+        #groups by distance instead.
+        if not isinstance(v, Vector):
+            return NotImplemented
+        a, b = self._data, v._data
+        if same_storage(a, b) and not is_ndarray(a) and a == b:
+            return True
+        return self.canonical() == v.canonical()
 
-    def __iter__(self):
-        self.current = 0
-        return self
+    def __ne__(self, v):
+        equal = self.__eq__(v)
+        return equal if equal is NotImplemented else not equal
 
-    def next(self):
-        if self.current >= len(self.coordinates):
-            raise StopIteration
-        else:
-            current_value = self.coordinates[self.current]
-            self.current += 1
-            return current_value
+    def __hash__(self):
+        return hash(self.canonical())
+
+    def __iter__(self):
+        #A fresh iterator each time, so nested and concurrent loops work.
+        #Elements are Python numbers whatever the backend, not numpy scalars.
+        if is_ndarray(self._data):
+            return iter(self.coordinates)
+        return iter(self._data)
 
     def __len__(self):
-        return len(self.coordinates)
+        return len(self._data)
 
     def __getitem__(self, i):
-        return self.coordinates[i]
+        if isinstance(i, slice) or is_ndarray(self._data):
+            return self.coordinates[i]
+        return self._data[i]
 
     def add(self,v):
-        #newVector = [x+y for x,y in zip(self.coordinates,v.coordinates)]
-        newVector = []
-        n = len(self.coordinates)
-        for i in range(n):
-            newVector.append(self.coordinates[i] + v.coordinates[i])
-        return Vector(newVector)
+        a, b = self._data, v._data
+        if same_storage(a, b):
+            if is_ndarray(a):
+                return Vector.from_storage(a + b)
+            return Vector.from_storage(array('d', [x+y for x,y in zip(a,b)]))
+        if isinstance(a, tuple) and isinstance(b, tuple):
+            #Short or exact on both sides, and so is the result
+            return Vector.from_storage(tuple([x+y for x,y in zip(a,b)]))
+        return Vector([x+y for x,y in zip(a,b)])
 
     def subtract(self,v):
-        newVector = [x-y for x,y in zip(self.coordinates,v.coordinates)]
-        return Vector(newVector)
+        a, b = self._data, v._data
+        if same_storage(a, b):
+            if is_ndarray(a):
+                return Vector.from_storage(a - b)
+            return Vector.from_storage(array('d', [x-y for x,y in zip(a,b)]))
+        if isinstance(a, tuple) and isinstance(b, tuple):
+            #Short or exact on both sides, and so is the result
+            return Vector.from_storage(tuple([x-y for x,y in zip(a,b)]))
+        return Vector([x-y for x,y in zip(a,b)])
 
     def magnitude(self):
-        squaredCoordinates = [x**2 for x in self.coordinates]
-        return (sum(squaredCoordinates))**.5
+        return (self.dotprod(self))**.5
 
     def scalar(self,k):
-        newVector = [x*k for x in self.coordinates]
-        return Vector(newVector)
+        a = self._data
+        if isinstance(a, tuple) and len(a) < buffer_dimension:
+            return Vector.from_storage(tuple([x*k for x in a]))
+        if isinstance(a, tuple) or not isinstance(k, FLOAT_TYPES):
+            return Vector([x*k for x in a])
+        if is_ndarray(a):
+            return Vector.from_storage(a * k)
+        return Vector.from_storage(array('d', [x*k for x in a]))
 
     def normal(self):
         return self.scalar(1/self.magnitude())
 
     def dotprod(self, v):
-        dotproduct = sum([x*y for x,y in zip(self.coordinates,v.coordinates)])
-        return dotproduct
+        a, b = self._data, v._data
+        if same_storage(a, b) and is_ndarray(a):
+            return float(numpy.dot(a, b))
+        return sum(imap(mul, a, b))
 
     def angle(self, v, type):
         u1 = self.normal()
@@ -82,11 +273,12 @@ class Vector(object):
             return (acos(dotproduct) * (180/3.1415))
 
     def is_parallel(self, v):
-        #Parallel - scalar multiple
-        newVector = [x/y for x,y in zip(self.coordinates,v.coordinates)]
-        for i in range(len(newVector)):
-            if (abs(newVector[0]-newVector[i]) > tolerance) :
-                return "Not Parallel"
+        #Parallel - scalar multiple, i.e. (v.w)^2 = |v|^2 |w|^2 (Cauchy-Schwarz
+        #equality); no division, so zero coordinates are fine and the zero
+        #vector is parallel to everything
+        vv, ww, vw = float(self.dotprod(self)), float(v.dotprod(v)), float(self.dotprod(v))
+        if abs(vw*vw - vv*ww) > tolerance * max(vv*ww, 1):
+            return "Not Parallel"
         return "Parallel"
 
 
@@ -106,10 +298,12 @@ class Vector(object):
         return self.subtract(projection)
 
     def cross(self, w):
-        newVector = []
-        newVector.append(self.coordinates[1]*w.coordinates[2] - w.coordinates[1]*self.coordinates[2])
-        newVector.append(-(self.coordinates[0]*w.coordinates[2] - w.coordinates[0]*self.coordinates[2]))
-        newVector.append(self.coordinates[0]*w.coordinates[1] - w.coordinates[0]*self.coordinates[1])
+        a, b = self._data, w._data
+        if same_storage(a, b) and is_ndarray(a):
+            return Vector.from_storage(numpy.cross(a, b))
+        newVector = [a[1]*b[2] - b[1]*a[2],
+                     -(a[0]*b[2] - b[0]*a[2]),
+                     a[0]*b[1] - b[0]*a[1]]
         return Vector(newVector)
 
     def area_parallelogram(self, w):
@@ -118,8 +312,18 @@ class Vector(object):
     def area_triangle(self, w):
         return ((self.cross(w)).magnitude())/2
 
+def lazyModuleTest():
+    print("******\nLAZY MODULE")
+    import json
+    m = LazyModule('json')
+    #Public names that LazyModule itself could shadow must be the module's
+    if not (m.load is json.load and m.loads is json.loads):
+        print('test case 1 failed')
+    if not (m.dumps([1.5]) == '[1.5]' and is_loaded(m)):
+        print('test case 2 failed')
+
 if __name__ == '__main__':
     v = Vector([2,3,4])
     w = Vector([3,4,5])
-    print v.cross(w)
-    print v.area_triangle(w)
\ No newline at end of file
+    print(v.cross(w))
+    print(v.area_triangle(w))
\ No newline at end of file
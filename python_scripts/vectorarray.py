@@ -0,0 +1,192 @@
+from math import acos, sqrt
+from array import array
+from operator import add, sub, mul, truediv
+from itertools import repeat
+
+from vector import Vector, numpy, is_ndarray, imap, tolerance
+
+
+class VectorArray(object):
+
+    ROWS_MUST_BE_NONEMPTY_MSG = 'A vector array needs at least one vector'
+    ALL_VECTORS_MUST_BE_IN_SAME_DIM_MSG = 'All vectors in the array should live in the same dimension'
+    SHAPES_MUST_MATCH_MSG = 'Both vector arrays should have the same shape'
+    CROSS_NEEDS_3D_MSG = 'The cross product is only defined for 3 dimensional vectors'
+
+    #N x d batch of vectors. With numpy the batch is one (N, d) float64 matrix;
+    #without it every coordinate is one array('d') column, so each operation is
+    #still a handful of C-level passes over contiguous buffers.
+    def __init__(self, vectors):
+        if is_ndarray(vectors):
+            rows = numpy.ascontiguousarray(vectors, dtype=numpy.float64)
+            if rows.ndim != 2 or rows.shape[0] == 0:
+                raise ValueError(self.ROWS_MUST_BE_NONEMPTY_MSG)
+            self._set_matrix(rows)
+            return
+
+        vectors = list(vectors)
+        if not vectors:
+            raise ValueError(self.ROWS_MUST_BE_NONEMPTY_MSG)
+        rows = [v.coordinates if isinstance(v, Vector) else tuple(v) for v in vectors]
+        d = len(rows[0])
+        for r in rows:
+            if len(r) != d:
+                raise Exception(self.ALL_VECTORS_MUST_BE_IN_SAME_DIM_MSG)
+
+        if numpy is not None:
+            self._set_matrix(numpy.array(rows, dtype=numpy.float64))
+        else:
+            self._set_columns([array('d', c) for c in zip(*rows)])
+
+    @classmethod
+    def from_columns(cls, columns):
+        va = cls.__new__(cls)
+        if numpy is not None:
+            va._set_matrix(numpy.ascontiguousarray(numpy.column_stack(columns), dtype=numpy.float64))
+        else:
+            va._set_columns([array('d', c) for c in columns])
+        return va
+
+    def _set_matrix(self, rows):
+        self._data = rows
+        self._columns = None
+        self.size, self.dimension = rows.shape
+
+    def _set_columns(self, columns):
+        self._data = None
+        self._columns = columns
+        self.size = len(columns[0])
+        self.dimension = len(columns)
+
+    def columns(self):
+        if self._data is not None:
+            return [self._data[:, j] for j in range(self.dimension)]
+        return self._columns
+
+    def to_numpy(self):
+        if self._data is not None:
+            return self._data
+        return numpy.column_stack(self._columns)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if self._data is not None:
+            return Vector(self._data[i])
+        return Vector([c[i] for c in self._columns])
+
+    def __iter__(self):
+        return (self[i] for i in range(self.size))
+
+    def __str__(self):
+        return 'VectorArray: {} vectors of dimension {}'.format(self.size, self.dimension)
+
+    def _check_shape(self, w):
+        if self.size != w.size or self.dimension != w.dimension:
+            raise ValueError(self.SHAPES_MUST_MATCH_MSG)
+
+    def add(self, w):
+        self._check_shape(w)
+        if self._data is not None:
+            return VectorArray(self._data + w._data)
+        return VectorArray.from_columns([array('d', imap(add, a, b)) for a, b in zip(self._columns, w._columns)])
+
+    def subtract(self, w):
+        self._check_shape(w)
+        if self._data is not None:
+            return VectorArray(self._data - w._data)
+        return VectorArray.from_columns([array('d', imap(sub, a, b)) for a, b in zip(self._columns, w._columns)])
+
+    def scalar(self, k):
+        #k is one number or one number per vector
+        if self._data is not None:
+            k = numpy.asarray(k, dtype=numpy.float64)
+            return VectorArray(self._data * (k[:, None] if k.ndim else k))
+        if isinstance(k, (int, float)):
+            return VectorArray.from_columns([array('d', imap(mul, c, repeat(k))) for c in self._columns])
+        return VectorArray.from_columns([array('d', imap(mul, c, k)) for c in self._columns])
+
+    def dotprod(self, w):
+        self._check_shape(w)
+        if self._data is not None:
+            return numpy.einsum('ij,ij->i', self._data, w._data)
+        cols = list(zip(self._columns, w._columns))
+        a, b = cols[0]
+        total = array('d', imap(mul, a, b))
+        for a, b in cols[1:]:
+            total = array('d', imap(add, total, imap(mul, a, b)))
+        return total
+
+    def magnitude(self):
+        if self._data is not None:
+            return numpy.sqrt(self.dotprod(self))
+        return array('d', imap(sqrt, self.dotprod(self)))
+
+    def normal(self):
+        if self._data is not None:
+            return VectorArray(self._data / self.magnitude()[:, None])
+        return self.scalar(array('d', [1/m for m in self.magnitude()]))
+
+    def angle(self, w, type):
+        #Same convention as Vector.angle: "Radians" or degrees otherwise
+        self._check_shape(w)
+        if self._data is not None:
+            norms = numpy.sqrt(numpy.einsum('ij,ij->i', self._data, self._data) *
+                               numpy.einsum('ij,ij->i', w._data, w._data))
+            theta = numpy.arccos(numpy.clip(self.dotprod(w) / norms, -1.0, 1.0))
+            if type == "Radians":
+                return theta
+            return theta * (180/3.1415)
+        scale = 1 if type == "Radians" else (180/3.1415)
+        return array('d', [acos(max(-1.0, min(1.0, d/sqrt(aa*bb)))) * scale
+                           for d, aa, bb in zip(self.dotprod(w), self.dotprod(self), w.dotprod(w))])
+
+    def cross(self, w):
+        self._check_shape(w)
+        if self.dimension != 3:
+            raise ValueError(self.CROSS_NEEDS_3D_MSG)
+        if self._data is not None:
+            return VectorArray(numpy.cross(self._data, w._data))
+        ax, ay, az = self._columns
+        bx, by, bz = w._columns
+        return VectorArray.from_columns([
+            array('d', imap(sub, imap(mul, ay, bz), imap(mul, by, az))),
+            array('d', imap(sub, imap(mul, bx, az), imap(mul, ax, bz))),
+            array('d', imap(sub, imap(mul, ax, by), imap(mul, bx, ay)))])
+
+    def comp_parallel(self, b):
+        #Projection onto b: (v . b / b . b) b, without normalizing b first
+        self._check_shape(b)
+        bb = b.dotprod(b)
+        if self._data is not None:
+            return b.scalar(self.dotprod(b) / bb)
+        return b.scalar(array('d', imap(truediv, self.dotprod(b), bb)))
+
+    def comp_orthogonal(self, b):
+        return self.subtract(self.comp_parallel(b))
+
+    def is_parallel(self, w):
+        #Mask form of Vector.is_parallel. Uses |v|^2|w|^2 - (v . w)^2 ~ 0, which
+        #also handles zero coordinates instead of dividing by them.
+        self._check_shape(w)
+        vw = self.dotprod(w)
+        vv = self.dotprod(self)
+        ww = w.dotprod(w)
+        if self._data is not None:
+            return numpy.abs(vv*ww - vw*vw) <= tolerance * numpy.maximum(vv*ww, 1.0)
+        return [abs(a*b - c*c) <= tolerance * max(a*b, 1.0) for a, b, c in zip(vv, ww, vw)]
+
+    def is_orthogonal(self, w):
+        vw = self.dotprod(w)
+        if self._data is not None:
+            return numpy.abs(vw) <= tolerance
+        return [abs(x) <= tolerance for x in vw]
+
+    def area_parallelogram(self, w):
+        return self.cross(w).magnitude()
+
+    def area_triangle(self, w):
+        if self._data is not None:
+            return self.area_parallelogram(w) / 2
+        return array('d', [x/2 for x in self.area_parallelogram(w)])